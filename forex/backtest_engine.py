@@ -0,0 +1,1113 @@
+'''
+Vectorized engine used by forex_backtest_class to search strategy parameters.
+Every indicator series is computed once per window as a column of a "bank" matrix (bars x windows),
+then all parameter combinations are scored together with NumPy broadcasting.
+'''
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+import time as _time
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+GRID_BLOCK_SIZE = 4_000_000 # Max number of (bar x combination) cells scored in one block
+
+#******************************************************* Indicator Cache **********************************************
+def _nbytes(value):
+    '''
+    Memory used by a cached value (array , DataFrame , Series , object with nbytes or tuple / dict of them)
+    '''
+    if hasattr(value, "nbytes") :
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame) :
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series) :
+        return int(value.memory_usage(index=True))
+    if isinstance(value, (tuple, list)) :
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict) :
+        return sum(_nbytes(v) for v in value.values())
+    return 64
+
+class Indicator_Cache(object):
+    '''
+    Memory limited LRU cache of indicator series , shared by the optimizers and the backtests.
+    Keys are (ticker , indicator , parameters , data fingerprint).
+    max_bytes : memory budget , the least recently used series are evicted when it is exceeded
+    Reads and writes are locked , so threads can share one cache (a missing value may be computed by two threads).
+    '''
+    def __repr__(self):
+        return "Indicator Cache (items={} , MB={:.1f} of {:.1f})".format(len(self.items), self.bytes / 2**20, self.max_bytes / 2**20)
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        '''
+        Cached value of key (and mark it as recently used) or None
+        '''
+        with self.lock :
+            value = self.items.get(key)
+            if value is None :
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value):
+        '''
+        Store value , values bigger than the whole budget are not kept
+        '''
+        size = _nbytes(value)
+        with self.lock :
+            if key in self.items :
+                self.bytes -= self.items.pop(key)[1]
+            if size > self.max_bytes :
+                return
+            self.items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes :
+                old_key, (old_value, old_size) = self.items.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+
+    def fetch(self, key, compute):
+        '''
+        Cached value of key , or compute() it and store it
+        '''
+        value = self.get(key)
+        if value is None :
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def bank(self, key, indicator, params, compute):
+        '''
+        Bank matrix (bars x params) built from cached columns , the missing columns are computed together
+        key     : (ticker , data fingerprint) of the input series
+        compute : function(list of missing params) -> matrix (bars x missing params)
+        '''
+        columns = {}
+        missing = []
+        for p in params :
+            if p in columns or p in missing :
+                continue
+            col = self.get((key[0], indicator, p, key[1]))
+            if col is None :
+                missing.append(p)
+            else :
+                columns[p] = col
+        if missing :
+            fresh = compute(missing)
+            for j, p in enumerate(missing) :
+                col = np.ascontiguousarray(fresh[:, j])
+                col.setflags(write=False)
+                self.put((key[0], indicator, p, key[1]), col)
+                columns[p] = col
+        if len(params) == 0 :
+            return compute([])
+        return np.column_stack([columns[p] for p in params])
+
+    def clear(self):
+        with self.lock :
+            self.items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        '''
+        Hit / miss statistics and memory use
+        '''
+        with self.lock :
+            total = self.hits + self.misses
+            return {"items": len(self.items), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+#******************************************************* Ticker Data **************************************************
+class Ticker_Data(object):
+    '''
+    OHLCV , returns and cum_return of one ticker as contiguous read-only float64 arrays with its own index.
+    Every ticker keeps its own valid bars , a gap in one ticker does not remove bars of the others.
+    ticker : name of the ticker
+    frame  : DataFrame with columns Open , High , Low , Close , Volume , returns , cum_return (without NaN)
+    '''
+    COLUMNS = ("Open", "High", "Low", "Close", "Volume", "returns", "cum_return")
+
+    def __repr__(self):
+        if len(self) :
+            return "Ticker Data (ticker={} , bars={} , start={} , end={})".format(self.ticker, len(self), self.index[0], self.index[-1])
+        return "Ticker Data (ticker={} , bars=0)".format(self.ticker)
+
+    def __init__(self, ticker, frame):
+        columns = {}
+        for c in self.COLUMNS :
+            values = np.ascontiguousarray(frame[c].to_numpy(dtype=np.float64))
+            values.setflags(write=False)
+            columns[c] = values
+        self.set_arrays(ticker, frame.index, columns)
+
+    @classmethod
+    def from_arrays(cls, ticker, index, columns):
+        '''
+        Ticker_Data on existing arrays (no copy) , columns : dict of COLUMNS -> 1-D float64 arrays
+        '''
+        data = cls.__new__(cls)
+        data.set_arrays(ticker, index, columns)
+        return data
+
+    def set_arrays(self, ticker, index, columns):
+        self.ticker = ticker
+        self.index = index
+        self.columns = columns
+        self.open, self.high, self.low, self.close = self.columns["Open"], self.columns["High"], self.columns["Low"], self.columns["Close"]
+        self.volume, self.returns, self.cum_return = self.columns["Volume"], self.columns["returns"], self.columns["cum_return"]
+
+    def __len__(self):
+        return len(self.index)
+
+    def head(self, rows):
+        '''
+        Ticker_Data of the first rows bars (views of the arrays , no copy)
+        '''
+        return Ticker_Data.from_arrays(self.ticker, self.index[:rows], {c: values[:rows] for c, values in self.columns.items()})
+
+    def to_frame(self, columns=("Open", "Low", "High", "Close", "returns", "cum_return")):
+        '''
+        Writable DataFrame of some columns (for strategies that add their own columns)
+        '''
+        return pd.DataFrame({c: self.columns[c] for c in columns}, index=self.index)
+
+    def fingerprint(self):
+        '''
+        Short hash of dates and OHLC arrays (a part of indicator cache keys)
+        '''
+        digest = hashlib.blake2b(digest_size=8)
+        if isinstance(self.index, pd.DatetimeIndex) :
+            digest.update(self.index.as_unit("ns").asi8.tobytes())
+        else :
+            digest.update(pd.util.hash_pandas_object(self.index).to_numpy().tobytes())
+        for values in (self.open, self.high, self.low, self.close) :
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+def share_ticker_data(data):
+    '''
+    Copy dates and columns of a Ticker_Data into one multiprocessing shared memory block for worker processes.
+    Returns (descriptor , block)
+        descriptor : small dict (name of block , ticker , rows , tz) to send to workers , see attach_ticker_data
+        block      : SharedMemory , the publisher keeps it and calls block.close() and block.unlink() when workers are done
+    '''
+    if not isinstance(data.index, pd.DatetimeIndex) :
+        raise ValueError("Only data with dates as index can be shared")
+    n = len(data)
+    tz = str(data.index.tz) if data.index.tz is not None else ""
+    block = shared_memory.SharedMemory(create=True, size=max(1, 8 * n * (len(data.COLUMNS) + 1)))
+    np.ndarray((n,), dtype=np.int64, buffer=block.buf)[:] = data.index.as_unit("ns").asi8
+    values = np.ndarray((len(data.COLUMNS), n), dtype=np.float64, buffer=block.buf, offset=8 * n)
+    for j, c in enumerate(data.COLUMNS) :
+        values[j] = data.columns[c]
+    descriptor = {"name": block.name, "ticker": data.ticker, "rows": n, "tz": tz, "index_name": data.index.name}
+    return descriptor, block
+
+def attach_ticker_data(descriptor):
+    '''
+    Ticker_Data whose columns are read-only views of a shared block made by share_ticker_data (zero copy).
+    The block stays open as long as the returned Ticker_Data (attribute shared_block).
+    '''
+    block = shared_memory.SharedMemory(name=descriptor["name"])
+    n = descriptor["rows"]
+    time = np.ndarray((n,), dtype=np.int64, buffer=block.buf)
+    values = np.ndarray((len(Ticker_Data.COLUMNS), n), dtype=np.float64, buffer=block.buf, offset=8 * n)
+    values.setflags(write=False)
+    index = pd.DatetimeIndex(time.view("datetime64[ns]"), name=descriptor["index_name"])
+    if descriptor["tz"] :
+        index = index.tz_localize("UTC").tz_convert(descriptor["tz"])
+    data = Ticker_Data.from_arrays(descriptor["ticker"], index, {c: values[j] for j, c in enumerate(Ticker_Data.COLUMNS)})
+    data.shared_block = block
+    return data
+
+#******************************************************* Multi Timeframe **********************************************
+def interval_ns(interval):
+    '''
+    Length of a fixed interval ("5m" , "15m" , "1h" , "4h" , "1d" ...) in nanoseconds
+    '''
+    length = pd.Timedelta(interval).value
+    if length <= 0 :
+        raise ValueError("Interval {} has no fixed length".format(interval))
+    return length
+
+class Timeframe_Bars(object):
+    '''
+    Bars of a bigger interval built from base bars , with alignment to the base series.
+    time     : start of each bar (wall clock ns , bins are aligned to midnight like pandas resample)
+    first    : first base row of each bar , last : last base row of each bar
+    base_bar : bar of each base row
+    closed   : latest bar already finished at the close of each base row (-1 before the first one) ,
+               use it for higher interval filters without looking ahead
+    Bins without any base bar are not kept.
+    '''
+    def __repr__(self):
+        return "Timeframe Bars (interval={} , bars={})".format(self.interval, len(self.time))
+
+    def __init__(self, interval, time, open, high, low, close, volume, first, last, base_bar):
+        self.interval = interval
+        self.time, self.open, self.high, self.low, self.close, self.volume = time, open, high, low, close, volume
+        self.first, self.last, self.base_bar = first, last, base_bar
+        rows = np.arange(len(base_bar))
+        self.closed = np.where(rows == last[base_bar], base_bar, base_bar - 1)
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self.__dict__.values() if isinstance(v, np.ndarray))
+
+    def align(self, values, closed=True):
+        '''
+        Values of the bars (for example an indicator of this interval) on every base row ,
+        from the last finished bar (closed=True) or the bar in progress (closed=False). NaN before the first bar.
+        '''
+        bar = self.closed if closed else self.base_bar
+        out = np.asarray(values, dtype=np.float64)[np.maximum(bar, 0)]
+        out[bar < 0] = np.nan
+        return out
+
+    def to_frame(self, tz=None):
+        index = pd.DatetimeIndex(self.time.view("datetime64[ns]"))
+        if tz :
+            index = index.tz_localize(tz)
+        return pd.DataFrame({"Open": self.open, "High": self.high, "Low": self.low, "Close": self.close, "Volume": self.volume}, index=index)
+
+def _aggregate(source, interval, length):
+    '''
+    Bars of interval (length ns) from the bars of source (Timeframe_Bars)
+    '''
+    if len(source.time) == 0 :
+        return Timeframe_Bars(interval, source.time, *([source.open] * 5), source.first, source.last, source.base_bar)
+    bins = np.floor_divide(source.time, length)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(bins)] - 1
+    bar_of_source = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    return Timeframe_Bars(interval, bins[starts] * length, source.open[starts],
+                          np.maximum.reduceat(source.high, starts), np.minimum.reduceat(source.low, starts),
+                          source.close[ends], np.add.reduceat(source.volume, starts),
+                          source.first[starts], source.last[ends], bar_of_source[source.base_bar])
+
+def aggregate_timeframes(time, open, high, low, close, volume, intervals):
+    '''
+    Build bars of every interval from sorted base bars in one sweep : intervals are built from the smallest to the
+    biggest and each one is aggregated from the biggest built interval that divides it (1h from 15m , 4h from 1h ...),
+    so base bars are read only once.
+    time : start of base bars as int64 wall clock ns
+    Returns dict interval -> Timeframe_Bars
+    '''
+    time = np.asarray(time, dtype=np.int64)
+    rows = np.arange(len(time))
+    base = Timeframe_Bars(None, time, *(np.asarray(v, dtype=np.float64) for v in (open, high, low, close, volume)), rows, rows, rows)
+    built = []
+    result = {}
+    for interval in sorted(set(intervals), key=interval_ns) :
+        length = interval_ns(interval)
+        source = base
+        for prev_length, prev in built :
+            if length % prev_length == 0 :
+                source = prev
+        result[interval] = _aggregate(source, interval, length)
+        built.append((length, result[interval]))
+    return result
+
+#******************************************************* Indicator Banks ***********************************************
+def close_returns(close):
+    '''
+    Log returns of close from every bar to the next one , log(Close / Close.shift(1)) of the kept bars.
+    Strategies that recompute "returns" after dropna (dema , rsi) use them : after a dropped bar (a gap) they hold the
+    whole move from the last kept bar , the stored Ticker_Data.returns do not.
+    Returns array of len(close) - 1
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    return np.log(close[1:] / close[:-1])
+
+def ema_bank(close, spans, adjust=True, min_periods=True, cache=None, key=None, name="ema"):
+    '''
+    Exponential moving average of close for every span , one EWM pass per span.
+    adjust      : same as pandas ewm(adjust=...)
+    min_periods : if True , rows before "span" observations are NaN (like ewm(span=s , min_periods=s))
+    name        : name of the series in the cache
+    Returns matrix (bars x spans)
+    '''
+    if cache is not None :
+        return cache.bank(key, (name, adjust, min_periods), list(spans), lambda missing : ema_bank(close, missing, adjust, min_periods))
+    series = pd.Series(np.asarray(close, dtype=np.float64))
+    bank = np.empty((len(series), len(spans)))
+    for j, s in enumerate(spans) :
+        mp = int(s) if min_periods else 0
+        bank[:, j] = series.ewm(span=s, adjust=adjust, min_periods=mp).mean().to_numpy()
+    return bank
+
+def rolling_extrema(x, windows, how="max", partial=False, cache=None, key=None, name="x"):
+    '''
+    Rolling max (or min) of x for many window lengths at once with a sparse table.
+    The table is built once in O(n log w) , then every window costs O(n) (max of two overlapping blocks).
+    how     : "max" or "min"
+    partial : if True the first bars use the part of the window that exists (like rolling(w , min_periods=0))
+              otherwise they are NaN (like rolling(w))
+    name    : name of x in the cache (for example "high")
+    Returns matrix (bars x windows)
+    '''
+    if cache is not None :
+        return cache.bank(key, ("rolling_" + how, name, partial), list(windows), lambda missing : rolling_extrema(x, missing, how, partial))
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    op = np.maximum if how == "max" else np.minimum
+    windows = [int(w) for w in windows]
+    out = np.full((n, len(windows)), np.nan)
+    if n == 0 or len(windows) == 0 :
+        return out
+    table = [x] # table[k][i] = extremum of x[i : i + 2**k]
+    span = 1
+    while span * 2 <= min(max(windows), n) :
+        prev = table[-1]
+        table.append(op(prev[:-span], prev[span:]))
+        span *= 2
+    running = op.accumulate(x) if partial else None
+    for j, w in enumerate(windows) :
+        if w <= n :
+            k = w.bit_length() - 1
+            level = table[k]
+            out[w-1:, j] = op(level[:n-w+1], level[w-(1 << k):n-(1 << k)+1])
+            if partial :
+                out[:w-1, j] = running[:w-1]
+        elif partial :
+            out[:, j] = running
+    return out
+
+def rolling_bank(close, windows, how="mean", cache=None, key=None):
+    '''
+    Pandas rolling mean or std (ddof=1) of close for every window , matrix (bars x windows)
+    how : "mean" or "std"
+    '''
+    if cache is not None :
+        return cache.bank(key, "rolling_" + how, list(windows), lambda missing : rolling_bank(close, missing, how))
+    series = pd.Series(np.asarray(close, dtype=np.float64))
+    bank = np.empty((len(series), len(windows)))
+    for j, w in enumerate(windows) :
+        bank[:, j] = getattr(series.rolling(int(w)), how)().to_numpy()
+    return bank
+
+#******************************************************* Scoring ******************************************************
+def pnl_kernel(pos, returns, spread=0, start=None, curves=False):
+    '''
+    Turn positions into strategy results for every column of a position matrix in one vectorized pass.
+    It is the shared pos -> trades -> str_net -> cum_str_net step of all strategies and optimizers.
+    pos     : matrix (bars x parameter sets) of 1 / 0 / -1 , a 1-D array is one column
+    returns : 1-D log returns of the same bars
+    spread  : spread of the instrument , half of it is paid for every unit of position change
+    start   : first valid bar of every column (rows before it are ignored like df.dropna()) , default 0
+    curves  : if True also return the equity curves
+    Returns (perf , trades , equity)
+        perf   : cum_str_net of the last bar for every column , NaN if the column has no bar to trade
+        trades : sum of position changes for every column
+        equity : matrix (bars x parameter sets) of cum_str_net , NaN until the first strategy return (None if curves=False)
+    '''
+    pos = np.asarray(pos)
+    if pos.ndim == 1 :
+        pos = pos[:, None]
+    n, cols = pos.shape
+    returns = np.asarray(returns, dtype=np.float64)
+    start = np.zeros(cols, dtype=np.int64) if start is None else np.broadcast_to(np.asarray(start, dtype=np.int64), (cols,))
+    if n < 2 :
+        equity = np.full((n, cols), np.nan) if curves else None
+        return np.full(cols, np.nan), np.zeros(cols, dtype=np.int64), equity
+    pos = pos.astype(np.float64, copy=False)
+    moves = np.abs(np.diff(pos, axis=0))
+    str_net = pos[:-1] * returns[1:, None]
+    str_net -= moves * (spread/2)
+    before = np.arange(n-1)[:, None] < start[None, :] # Bars dropped before the first valid bar
+    str_net[before] = 0.0
+    moves[before] = 0.0
+    total = str_net.sum(axis=0)
+    perf = np.exp(total)
+    perf[start >= n-1] = np.nan
+    trades = moves.sum(axis=0).astype(np.int64)
+    equity = None
+    if curves :
+        equity = np.full((n, cols), np.nan)
+        equity[1:] = np.exp(np.cumsum(str_net, axis=0))
+        equity[1:][before] = np.nan
+    return perf, trades, equity
+
+def window_kernel(pos, returns, spread, start, windows):
+    '''
+    Performance of every column in many row windows from one pass : the cumulative str_net of pnl_kernel is read at
+    the window bounds , so a window costs two rows whatever its length.
+    windows : int matrix (windows x 2) of [first row , end row) , every window is scored like a DataFrame of its rows
+    The *_grid functions take the same windows argument and then return one more (last) dimension of windows.
+    Returns matrix (parameter sets x windows) , NaN where a window has no bar to trade
+    '''
+    pos = np.asarray(pos)
+    if pos.ndim == 1 :
+        pos = pos[:, None]
+    n, cols = pos.shape
+    windows = np.asarray(windows, dtype=np.int64).reshape(-1, 2)
+    start = np.broadcast_to(np.asarray(start, dtype=np.int64), (cols,))
+    if n < 2 :
+        return np.full((cols, len(windows)), np.nan)
+    returns = np.asarray(returns, dtype=np.float64)
+    pos = pos.astype(np.float64, copy=False)
+    cum = np.abs(np.diff(pos, axis=0))
+    cum *= -(spread/2)
+    cum += pos[:-1] * returns[1:, None]
+    cum[np.arange(n-1)[:, None] < start[None, :]] = 0.0
+    np.cumsum(cum, axis=0, out=cum)
+    cum = np.vstack((np.zeros((1, cols)), cum)) # cum[t] : sum of str_net of bars 1 .. t
+    lo = np.clip(windows[:, 0], 0, n - 1)
+    hi = np.clip(windows[:, 1], 0, n) - 1
+    perf = np.exp(cum[np.maximum(hi, lo)].T - cum[lo].T)
+    perf[np.maximum(lo[None, :], start[:, None]) >= hi[None, :]] = np.nan
+    return perf
+
+def _keep_windows(windows, rows):
+    '''
+    Windows of original rows moved to a series that keeps only "rows" (sorted original row numbers)
+    '''
+    if windows is None :
+        return None
+    return np.searchsorted(rows, np.asarray(windows, dtype=np.int64).reshape(-1, 2))
+
+def _window_shape(windows):
+    '''
+    Extra trailing dimension of grid results when windows are scored
+    '''
+    return () if windows is None else (len(np.asarray(windows).reshape(-1, 2)),)
+
+def _score_positions(pos, returns, spread, start, windows=None):
+    '''
+    Final performance of every column for ranking , columns without any bar to trade get -inf.
+    With windows the result has one column per window (see window_kernel).
+    '''
+    if windows is None :
+        perf = pnl_kernel(pos, returns, spread, start)[0]
+    else :
+        perf = window_kernel(pos, returns, spread, start, windows)
+    return np.where(np.isnan(perf), -np.inf, perf)
+
+def _score_masked(pos, returns, spread, valid, windows=None):
+    '''
+    Same as _score_positions but the valid bars of every column are given as a boolean matrix.
+    Columns whose valid bars are not one block at the end (NaN inside the series) are compressed one by one ,
+    like df.dropna() does.
+    '''
+    n, cols = pos.shape
+    start = n - valid[::-1].cumprod(axis=0).sum(axis=0) # First bar of the valid block at the end
+    suffix = valid.sum(axis=0) == n - start
+    perf = np.empty((cols,) + _window_shape(windows))
+    if suffix.any() :
+        perf[suffix] = _score_positions(pos[:, suffix], returns, spread, start[suffix], windows)
+    for c in np.flatnonzero(~suffix) :
+        rows = valid[:, c]
+        perf[c] = _score_positions(pos[rows, c:c+1], returns[rows], spread, [0], _keep_windows(windows, np.flatnonzero(rows)))[0]
+    return perf
+
+def _block_rows(num_rows, cells_per_row):
+    '''
+    How many rows of a grid fit in one block of GRID_BLOCK_SIZE cells
+    '''
+    return max(1, min(num_rows, GRID_BLOCK_SIZE // max(1, cells_per_row)))
+
+def crossover_grid(short_bank, long_bank, returns, spread, short_start, long_start, windows=None):
+    '''
+    Score the crossover strategy (pos=1 if short > long else -1) for every (short , long) pair.
+    short_bank , long_bank   : matrices (bars x shorts) and (bars x longs)
+    short_start , long_start : first valid bar of every column
+    windows                  : optional row windows (see window_kernel) , they add a last dimension to the result
+    Returns matrix (shorts x longs) of performance
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    n, num_s = short_bank.shape
+    num_l = long_bank.shape[1]
+    short_start = np.asarray(short_start)
+    long_start = np.asarray(long_start)
+    perf = np.empty((num_s, num_l) + _window_shape(windows))
+    block = _block_rows(num_s, n * num_l)
+    for i in range(0, num_s, block) :
+        j = min(i + block, num_s)
+        pos = np.where(short_bank[:, i:j, None] > long_bank[:, None, :], 1, -1).astype(np.int8)
+        start = np.maximum(short_start[i:j, None], long_start[None, :])
+        perf[i:j] = _score_positions(pos.reshape(n, -1), returns, spread, start.ravel(), windows).reshape((j-i, num_l) + _window_shape(windows))
+    return perf
+
+#******************************************************* Moving Average Grids *****************************************
+def sma_grid(close, returns, shorts, longs, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of sma strategy for every (short , long) pair , shape (shorts x longs)
+    '''
+    lengths = sorted(set(shorts) | set(longs))
+    col = {w: j for j, w in enumerate(lengths)}
+    bank = rolling_bank(close, lengths, "mean", cache, key) # same pandas rolling mean as sma() and sma_backtest
+    s_idx = [col[s] for s in shorts]
+    l_idx = [col[l] for l in longs]
+    return crossover_grid(bank[:, s_idx], bank[:, l_idx], returns, spread,
+                          np.array(shorts) - 1, np.array(longs) - 1, windows)
+
+def ema_grid(close, returns, shorts, longs, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of ema strategy for every (short , long) pair , shape (shorts x longs)
+    '''
+    spans = sorted(set(shorts) | set(longs))
+    col = {s: j for j, s in enumerate(spans)}
+    bank = ema_bank(close, spans, cache=cache, key=key)
+    s_idx = [col[s] for s in shorts]
+    l_idx = [col[l] for l in longs]
+    return crossover_grid(bank[:, s_idx], bank[:, l_idx], returns, spread,
+                          np.array(shorts) - 1, np.array(longs) - 1, windows)
+
+def dema_grid(close, returns, shorts, longs, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of dema strategy for every (short , long) pair , shape (shorts x longs)
+    Same as forex_backtest_class.dema : the first bar is dropped and both DEMA lines are smoothed again with "short" span.
+    returns are recomputed from close like dema() does (close_returns) , the returns argument is not used.
+    '''
+    returns = close_returns(close)
+    close = np.asarray(close, dtype=np.float64)[1:]
+    windows = _keep_windows(windows, np.arange(1, len(close) + 1))
+    spans = sorted(set(shorts) | set(longs))
+    col = {s: j for j, s in enumerate(spans)}
+    bank = ema_bank(close, spans, adjust=False, min_periods=False, cache=cache, key=key, name="ema_from_bar1")
+    l_idx = [col[l] for l in longs]
+    perf = np.empty((len(shorts), len(longs)) + _window_shape(windows))
+    for i, s in enumerate(shorts) :
+        stack = np.column_stack((bank[:, col[s]], bank[:, l_idx]))
+        smooth = pd.DataFrame(stack).ewm(span=s, adjust=False).mean().to_numpy()
+        dema = 2 * stack - smooth
+        perf[i] = crossover_grid(dema[:, :1], dema[:, 1:], returns, spread, [0], np.zeros(len(longs), dtype=int), windows)[0]
+    return perf
+
+def macd_grid(close, returns, shorts, longs, signals, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of macd strategy for every (short , long , signal) , shape (shorts x longs x signals)
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    spans = sorted(set(shorts) | set(longs))
+    col = {s: j for j, s in enumerate(spans)}
+    bank = ema_bank(close, spans, cache=cache, key=key)
+    n = bank.shape[0]
+    num_s, num_l = len(shorts), len(longs)
+    macd = (bank[:, [col[s] for s in shorts]][:, :, None] - bank[:, [col[l] for l in longs]][:, None, :]).reshape(n, -1)
+    macd_start = np.maximum(np.array(shorts)[:, None], np.array(longs)[None, :]).ravel() - 1
+    perf = np.empty((num_s * num_l, len(signals)) + _window_shape(windows))
+    frame = pd.DataFrame(macd)
+    for k, sig in enumerate(signals) :
+        signal = frame.ewm(span=sig, min_periods=sig).mean().to_numpy()
+        start = macd_start + sig - 1
+        block = _block_rows(macd.shape[1], n)
+        for i in range(0, macd.shape[1], block) :
+            j = min(i + block, macd.shape[1])
+            pos = np.where(macd[:, i:j] - signal[:, i:j] > 0, 1, -1).astype(np.int8)
+            perf[i:j, k] = _score_positions(pos, returns, spread, start[i:j], windows)
+    return perf.reshape((num_s, num_l, len(signals)) + _window_shape(windows))
+
+#******************************************************* RSI Grid ****************************************************
+def rsi_bank(close, periods, cache=None, key=None, name="rsi_from_bar1"):
+    '''
+    RSI of close for every period as columns of one matrix (same formula as forex_backtest_class.rsi).
+    The first bar has no difference and counts as a zero move.
+    Returns matrix (bars x periods) , NaN where RSI is not defined
+    '''
+    if cache is not None :
+        return cache.bank(key, name, list(periods), lambda missing : rsi_bank(close, missing))
+    close = pd.Series(np.asarray(close, dtype=np.float64))
+    diff = close.diff()
+    up = pd.Series(np.where(diff > 0, diff, 0))
+    down = pd.Series(np.where(diff < 0, -diff, 0))
+    bank = np.empty((len(close), len(periods)))
+    for j, p in enumerate(periods) :
+        ma_up = up.rolling(int(p)).mean()
+        ma_down = down.rolling(int(p)).mean()
+        bank[:, j] = (ma_up / (ma_up + ma_down) * 100).to_numpy()
+    return bank
+
+def rsi_grid(close, returns, periods, downs, ups, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of rsi strategy for every (period , ma_down , ma_up) , shape (periods x downs x ups)
+    RSI is computed once per period , then the positions of all threshold couples are built as one
+    tensor (bars x downs x ups) : buy (1) under ma_down , sell (-1) over ma_up , otherwise 0.
+    returns are recomputed from close like rsi() does (close_returns) , the returns argument is not used.
+    '''
+    returns = close_returns(close)
+    bank = rsi_bank(np.asarray(close, dtype=np.float64)[1:], periods, cache, key)
+    downs = np.array([int(d) for d in downs])
+    ups = np.array([int(u) for u in ups])
+    num_d, num_u = len(downs), len(ups)
+    perf = np.empty((len(periods), num_d, num_u) + _window_shape(windows))
+    for k in range(len(periods)) :
+        valid = ~np.isnan(bank[:, k]) # Bars without RSI are dropped like df.dropna()
+        kept = _keep_windows(windows, np.flatnonzero(valid) + 1) # +1 : the first bar is dropped
+        rsi = bank[valid, k]
+        ret = returns[valid]
+        m = len(rsi)
+        buy = rsi[:, None] < downs[None, :]
+        sell = (rsi[:, None] > ups[None, :]).astype(np.int8)
+        block = _block_rows(num_d, m * num_u)
+        for i in range(0, num_d, block) :
+            j = min(i + block, num_d)
+            pos = np.where(buy[:, i:j, None], np.int8(1), -sell[:, None, :])
+            perf[k, i:j] = _score_positions(pos.reshape(m, -1), ret, spread, np.zeros((j-i) * num_u, dtype=int), kept).reshape((j-i, num_u) + _window_shape(windows))
+    return perf
+
+#******************************************************* Stochastic & Ichimoku Grids *********************************
+def stochastic_grid(high, low, close, returns, ks, ds, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of stochastic strategy for every (K , D) , shape (ks x ds)
+    Rolling low / high of all K windows come from one rolling_extrema call.
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.asarray(returns, dtype=np.float64)
+    roll_low = rolling_extrema(low, ks, how="min", cache=cache, key=key, name="low")
+    roll_high = rolling_extrema(high, ks, how="max", cache=cache, key=key, name="high")
+    perf = np.empty((len(ks), len(ds)) + _window_shape(windows))
+    with np.errstate(divide="ignore", invalid="ignore") :
+        for i in range(len(ks)) :
+            k = (close - roll_low[:, i]) / (roll_high[:, i] - roll_low[:, i]) * 100
+            k_series = pd.Series(k)
+            d = np.column_stack([k_series.rolling(int(w)).mean().to_numpy() for w in ds])
+            pos = np.where(k[:, None] > d, 1, -1).astype(np.int8)
+            valid = ~np.isnan(d) & ~np.isnan(k)[:, None]
+            perf[i] = _score_masked(pos, returns, spread, valid, windows)
+    return perf
+
+def ichimoku_lines(high, low, windows, cache=None, key=None):
+    '''
+    Middle of the highest high and lowest low for every window , like the Tenkan-sen / Kijun-sen / Senkou B lines
+    of ta.trend.IchimokuIndicator(fillna=True) (first bars use the available part of the window).
+    Returns matrix (bars x windows)
+    '''
+    if cache is not None :
+        return cache.bank(key, "ichimoku_line", list(windows), lambda missing : ichimoku_lines(high, low, missing))
+    return 0.5 * (rolling_extrema(high, windows, how="max", partial=True) + rolling_extrema(low, windows, how="min", partial=True))
+
+def ichimoku_grid(high, low, returns, tenkans, kijuns, senkous, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of ichimoku strategy for every (tenkan , kijun , senkou) , shape (tenkans x kijuns x senkous)
+    pos = (sign(tenkan - kijun) + sign(span_a - span_b)) / 2
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    conv = ichimoku_lines(high, low, tenkans, cache, key)
+    base = ichimoku_lines(high, low, kijuns, cache, key)
+    span_b = ichimoku_lines(high, low, senkous, cache, key)
+    n = conv.shape[0]
+    num_k, num_s = len(kijuns), len(senkous)
+    perf = np.empty((len(tenkans), num_k, num_s) + _window_shape(windows))
+    block = _block_rows(num_k, n * num_s)
+    for i in range(len(tenkans)) :
+        for a in range(0, num_k, block) :
+            b = min(a + block, num_k)
+            pos1 = np.where(conv[:, i:i+1] > base[:, a:b], 1, -1).astype(np.int8)
+            span_a = 0.5 * (conv[:, i:i+1] + base[:, a:b])
+            pos2 = np.where(span_a[:, :, None] > span_b[:, None, :], 1, -1).astype(np.int8)
+            pos = (pos1[:, :, None] + pos2) // 2
+            perf[i, a:b] = _score_positions(pos.reshape(n, -1), returns, spread, np.zeros((b-a) * num_s, dtype=int), windows).reshape((b-a, num_s) + _window_shape(windows))
+    return perf
+
+#******************************************************* Bollinger Grid **********************************************
+def _next_true(cond):
+    '''
+    For every bar t of a boolean matrix (bars x columns) : first bar >= t where cond is True , else number of bars
+    '''
+    n = cond.shape[0]
+    idx = np.where(cond, np.arange(n)[:, None], n)
+    return np.minimum.accumulate(idx[::-1], axis=0)[::-1]
+
+def bollinger_positions(close, sma, lower, upper, start, allow=None):
+    '''
+    Positions of the mean reversion state machine of forex_backtest_class.bollinger_backtest for many parameter sets.
+    close                : 1-D prices (bars)
+    sma , lower , upper  : matrices (bars x parameter sets)
+    start                : first bar every parameter set can trade
+    allow                : optional boolean array (bars) , entries and exits only happen where it is True (ADX filter)
+        position 0  : buy under lower band , sell over upper band
+        position 1  : when close goes over sma , flip to short over upper band otherwise close to 0
+        position -1 : when close goes under sma , flip to long under lower band otherwise close to 0
+    The machine jumps from one trade to the next with "next bar where" tables , so all parameter sets move
+    together and the loop runs once per trade , not once per bar. Trades happen until the bar before the last.
+    Returns int8 matrix (bars x parameter sets)
+    '''
+    close = np.asarray(close, dtype=np.float64)[:, None]
+    n, cols = sma.shape
+    below_lower = close < lower
+    above_upper = close > upper
+    allow = np.ones((n, 1), dtype=bool) if allow is None else np.asarray(allow, dtype=bool).reshape(n, 1)
+    next_lower = _next_true(below_lower & allow)
+    next_upper = _next_true(above_upper & allow)
+    next_above_sma = _next_true((close > sma) & allow)
+    next_below_sma = _next_true((close < sma) & allow)
+    next_lower = np.vstack((next_lower, np.full((1, cols), n))) # Extra row : searching after the last bar
+    next_upper = np.vstack((next_upper, np.full((1, cols), n)))
+    next_above_sma = np.vstack((next_above_sma, np.full((1, cols), n)))
+    next_below_sma = np.vstack((next_below_sma, np.full((1, cols), n)))
+
+    delta = np.zeros((n, cols), dtype=np.int8)
+    state = np.zeros(cols, dtype=np.int8)
+    bar = np.minimum(np.asarray(start), n) # Search the next trade from this bar
+    col = np.arange(cols)
+    active = bar < n - 1
+    while active.any() :
+        c = col[active]
+        b = bar[active]
+        s = state[active]
+        lo = next_lower[b, c]
+        up = next_upper[b, c]
+        flat_event = np.minimum(lo, up)
+        flat_state = np.where(lo <= up, 1, -1)
+        long_event = next_above_sma[b, c]
+        short_event = next_below_sma[b, c]
+        event = np.where(s == 0, flat_event, np.where(s == 1, long_event, short_event))
+        ok = event < n - 1
+        e = np.minimum(event, n - 1)
+        new_state = np.where(s == 0, flat_state,
+                    np.where(s == 1, np.where(above_upper[e, c], -1, 0),
+                                     np.where(below_lower[e, c], 1, 0))).astype(np.int8)
+        delta[e[ok], c[ok]] = new_state[ok] - s[ok]
+        state[c[ok]] = new_state[ok]
+        bar[c] = e + 1
+        active[c[~ok]] = False
+    return np.cumsum(delta, axis=0, dtype=np.int8)
+
+def bollinger_grid(close, returns, smas, devs, spread=0, cache=None, key=None, windows=None):
+    '''
+    Performance of bollinger mean reversion strategy (same logic as bollinger_backtest) for every (sma , dev) ,
+    shape (smas x devs)
+    Rolling mean and std are computed once per window , dev is broadcast over them.
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.asarray(returns, dtype=np.float64)
+    n = len(close)
+    devs = np.asarray(devs, dtype=np.float64)
+    num_d = len(devs)
+    perf = np.empty((len(smas), num_d) + _window_shape(windows))
+    block = _block_rows(len(smas), n * num_d * 6)
+    for i in range(0, len(smas), block) :
+        sma_windows = list(smas[i:i + block])
+        mean = rolling_bank(close, sma_windows, "mean", cache, key)
+        std = rolling_bank(close, sma_windows, "std", cache, key)
+        sma = np.repeat(mean, num_d, axis=1)
+        lower = (mean[:, :, None] - std[:, :, None] * devs[None, None, :]).reshape(n, -1)
+        upper = (mean[:, :, None] + std[:, :, None] * devs[None, None, :]).reshape(n, -1)
+        start = np.repeat(np.array(sma_windows, dtype=int) - 1, num_d)
+        pos = bollinger_positions(close, sma, lower, upper, start)
+        perf[i:i + len(sma_windows)] = _score_positions(pos, returns, spread, start, windows).reshape((len(sma_windows), num_d) + _window_shape(windows))
+    return perf
+
+#******************************************************* Trade Simulator *********************************************
+def signal_positions(long_signal, short_signal):
+    '''
+    Bookkeeping position of the *_backtest loops : go long on long_signal , go short on short_signal , otherwise hold.
+    The last bar only closes the position , so it never trades.
+    Returns int8 array (bars)
+    '''
+    signal = np.where(long_signal, 1, np.where(short_signal, -1, 0)).astype(np.int8)
+    signal[-1:] = 0
+    last = np.maximum.accumulate(np.where(signal != 0, np.arange(len(signal)), 0))
+    return signal[last]
+
+def ichimoku_positions(tenkan, kijun, span_a, span_b):
+    '''
+    Bookkeeping position of ichimoku_backtest :
+        position 0  : go long if tenkan > kijun and span_a > span_b , go short if both are under
+        position 1  : go to 0 when tenkan goes under kijun
+        position -1 : go to 0 when tenkan goes over kijun
+    Returns int8 array (bars)
+    '''
+    tenkan, kijun = np.asarray(tenkan), np.asarray(kijun)
+    span_a, span_b = np.asarray(span_a), np.asarray(span_b)
+    n = len(tenkan)
+    delta = np.zeros(n, dtype=np.int8)
+    if n < 2 :
+        return delta
+    tables = _next_true(np.column_stack((
+        (tenkan > kijun) & (span_a > span_b), # 0 -> 1
+        (tenkan < kijun) & (span_a < span_b), # 0 -> -1
+        tenkan < kijun, # 1 -> 0
+        tenkan > kijun, # -1 -> 0
+    )))
+    bar, state = 0, 0
+    while bar < n - 1 :
+        if state == 0 :
+            up, down = tables[bar, 0], tables[bar, 1]
+            event, new_state = (up, 1) if up <= down else (down, -1)
+        else :
+            event, new_state = tables[bar, 2 if state == 1 else 3], 0
+        if event >= n - 1 :
+            break
+        delta[event] = new_state - state
+        state, bar = new_state, event + 1
+    return np.cumsum(delta, dtype=np.int8)
+
+def simulate_trades(pos, close, spread=0, amount=0, ledger=None, time=None):
+    '''
+    Trade a bookkeeping position path the way go_long / go_short do with amount="all".
+    pos    : position after each bar (1 , 0 , -1)
+    close  : close price of each bar
+    spread : half of it is added to buy price and removed from sell price
+    amount : initial capital
+    ledger : optional Trade_Ledger , every fill is appended to it
+    time   : int64 ns time of each bar for the ledger (default the bar numbers)
+    From position 0 all the balance is invested (int(balance / price) units).
+    From position 1 (or -1) every order sells (or buys) two times the units in hand , like go_short (or go_long).
+    Prices are rounded to 5 and balance to 2 digits like buy_instrument / sell_instrument.
+    Only the bars where the position changes are visited , so the loop runs once per trade.
+    Returns (balance , units , trades)
+    '''
+    pos = np.asarray(pos)
+    prev = np.concatenate(([0], pos[:-1]))
+    bars = np.flatnonzero(pos != prev)
+    prices = np.round(np.asarray(close, dtype=np.float64)[bars], 5)
+    if ledger is not None :
+        ledger.reserve(len(bars) + 1) # and the closing trade
+        times = bars if time is None else np.asarray(time)[bars]
+    balance, units = amount, 0
+    for i, (new, old, price) in enumerate(zip(pos[bars], prev[bars], prices)) :
+        side = -old if old != 0 else new
+        if side == 1 :
+            net = price + spread/2
+            qty = -units * 2 if old == -1 else int(balance / net)
+            balance = np.round(balance - qty * net, 2)
+            units += qty
+        else :
+            net = price - spread/2
+            qty = units * 2 if old == 1 else int(balance / net)
+            balance = np.round(balance + qty * net, 2)
+            units -= qty
+        if ledger is not None :
+            ledger.append(bars[i], times[i], side, qty, price, net, balance)
+    return balance, units, len(bars)
+
+#******************************************************* Trade Ledger ************************************************
+class Trade_Ledger(object):
+    '''
+    Columnar record of fills : preallocated arrays of bar , time (int64 ns) , side (1 buy , -1 sell) , units ,
+    price , net price (price with half of the spread) , balance after the fill and closing (True for the trade
+    that closes the position at the end). The arrays grow by doubling , so appending is amortized O(1).
+    spread   : spread of the trades (for the console lines)
+    capacity : rows allocated at the start
+    '''
+    COLUMNS = (("bar", np.int64), ("time", np.int64), ("side", np.int8), ("units", np.int64), ("price", np.float64),
+               ("net_price", np.float64), ("balance", np.float64), ("closing", np.bool_))
+
+    def __repr__(self):
+        return "Trade Ledger (trades={} , spread={})".format(self.size, self.spread)
+
+    def __len__(self):
+        return self.size
+
+    def __init__(self, spread=0, capacity=64):
+        self.spread = spread
+        self.size = 0
+        self.columns = {name : np.empty(max(1, int(capacity)), dtype=dtype) for name, dtype in self.COLUMNS}
+
+    def reserve(self, rows):
+        '''
+        Make room for rows more fills
+        '''
+        need = self.size + int(rows)
+        capacity = len(self.columns["bar"])
+        if need > capacity :
+            capacity = max(need, capacity * 2)
+            for name, values in self.columns.items() :
+                grown = np.empty(capacity, dtype=values.dtype)
+                grown[:self.size] = values[:self.size]
+                self.columns[name] = grown
+
+    def append(self, bar, time, side, units, price, net_price, balance, closing=False):
+        if self.size == len(self.columns["bar"]) :
+            self.reserve(1)
+        i = self.size
+        c = self.columns
+        c["bar"][i], c["time"][i], c["side"][i], c["units"][i] = bar, time, side, units
+        c["price"][i], c["net_price"][i], c["balance"][i], c["closing"][i] = price, net_price, balance, closing
+        self.size += 1
+
+    def close(self, bar, time, units, price, balance):
+        '''
+        Append the trade that closes "units" in the last bar. Its net price follows the side like every fill :
+        price + spread/2 when a short is bought back , price - spread/2 when a long is sold.
+        '''
+        self.append(bar, time, -np.sign(units), abs(units), price, price + np.sign(-units) * self.spread/2, balance, True)
+
+    def copy(self):
+        '''
+        Ledger with its own arrays of the filled rows (appending to one does not change the other)
+        '''
+        other = Trade_Ledger(self.spread, self.size)
+        for name in self.columns :
+            other.columns[name][:self.size] = self.column(name)
+        other.size = self.size
+        return other
+
+    def column(self, name):
+        '''
+        Filled part of one column (a view)
+        '''
+        return self.columns[name][:self.size]
+
+    def to_frame(self, tz=None):
+        '''
+        DataFrame of the fills with "time" as dates (in tz if given)
+        '''
+        df = pd.DataFrame({name : self.column(name) for name, dtype in self.COLUMNS})
+        df["time"] = pd.to_datetime(df["time"], unit="ns", utc=tz is not None)
+        if tz is not None :
+            df["time"] = df["time"].dt.tz_convert(tz)
+        return df
+
+    def lines(self, tz=None):
+        '''
+        Console lines of the fills in the words of buy_instrument / sell_instrument / close_position (a generator)
+        The closing line prints price - spread/2 as net price for a long or a short , like close_position always did ,
+        the net_price column keeps the side aware price.
+        '''
+        dates = self.to_frame(tz)["time"].dt.strftime('%Y-%m-%d %H:%M:%S')
+        c = {name : self.column(name) for name, dtype in self.COLUMNS}
+        for i in range(self.size) :
+            if c["closing"][i] :
+                yield "{} Closing Position {} for {} with {} spread. Net price is {} and current balance is {}".format(
+                    dates[i], -c["side"][i] * c["units"][i], round(c["price"][i], 5), self.spread, round(c["price"][i] - self.spread/2, 5), round(c["balance"][i], 2))
+            else :
+                yield "{} {} {} for {} with {} spread. Net price is {} and current balance is {}".format(
+                    dates[i], "Buying" if c["side"][i] == 1 else "Selling", c["units"][i], round(c["price"][i], 5), self.spread,
+                    round(c["net_price"][i], 5), c["balance"][i])
+
+    def to_npz(self, path):
+        '''
+        Save the columns in one .npz file (numpy.load(path) gives the arrays back)
+        '''
+        np.savez(path, spread=np.float64(self.spread), **{name : self.column(name) for name, dtype in self.COLUMNS})
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as f :
+            ledger = cls(float(f["spread"]), len(f["bar"]))
+            for name, dtype in cls.COLUMNS :
+                ledger.columns[name][:len(f[name])] = f[name]
+            ledger.size = len(f["bar"])
+        return ledger
+
+    def to_sqlite(self, path, table="trades", **tags):
+        '''
+        Append the fills to a SQLite table in one transaction
+        tags : constant columns of every row (for example ticker="EURUSD=X" , strategy="sma")
+        '''
+        names = list(tags) + [name for name, dtype in self.COLUMNS]
+        rows = zip(*([[value] * self.size for value in tags.values()] + [self.column(name).tolist() for name, dtype in self.COLUMNS]))
+        conn_db = sqlite3.connect(path)
+        try :
+            conn_db.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(table, " , ".join(names)))
+            conn_db.executemany("INSERT INTO {} ({}) VALUES ({})".format(table, " , ".join(names), ",".join("?" * len(names))), rows)
+            conn_db.commit()
+        finally :
+            conn_db.close()
+
+class Trade_View(object):
+    '''
+    Rate limited console view of trade lines
+    every     : print one of every "every" lines
+    max_lines : stop after this many printed lines (None for no limit , 0 prints nothing)
+    interval  : least seconds between two printed lines
+    Lines that are not printed are only counted , the trades stay in the ledger.
+    '''
+    def __repr__(self):
+        return "Trade View (every={} , max_lines={} , interval={})".format(self.every, self.max_lines, self.interval)
+
+    def __init__(self, every=1, max_lines=None, interval=0.0):
+        self.every = max(1, int(every))
+        self.max_lines = max_lines
+        self.interval = interval
+        self.seen = self.printed = 0
+        self.last = -np.inf
+
+    def show(self, line):
+        '''
+        Print the line if the limits allow it , returns True if it was printed
+        '''
+        self.seen += 1
+        if (self.seen - 1) % self.every or (self.max_lines is not None and self.printed >= self.max_lines) :
+            return False
+        if self.interval :
+            now = _time.monotonic()
+            if now - self.last < self.interval :
+                return False
+            self.last = now
+        print(line)
+        self.printed += 1
+        return True
+
+    def skipped(self):
+        return self.seen - self.printed
+
+#******************************************************* ATR & ADX ***************************************************
+def true_range(high, low, close):
+    '''
+    True range of every bar : max(High - Low , |High - previous Close| , |Low - previous Close|) , NaN for the first bar
+    '''
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return np.maximum(np.abs(high - low), np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr_bank(high, low, close, periods):
+    '''
+    Average True Range (rolling mean of true range) for every period , matrix (bars x periods)
+    '''
+    tr = pd.Series(true_range(high, low, close))
+    return np.column_stack([tr.rolling(int(p)).mean().to_numpy() for p in periods]) if len(periods) else np.empty((len(tr), 0))
+
+def _wilder(values, period, seed):
+    '''
+    Wilder smoothing x[i] = x[i-1] * (1 - 1/period) + values[i] starting with x[first] = seed ,
+    done with one pandas ewm(adjust=False) pass instead of a Python loop.
+    values : values from the first smoothed bar to the end
+    '''
+    alpha = 1 / period
+    w = np.array(values, dtype=np.float64)
+    w[0] = seed * alpha
+    return pd.Series(w).ewm(alpha=alpha, adjust=False).mean().to_numpy() / alpha
+
+def adx_bank(high, low, close, periods):
+    '''
+    +DI , -DI and ADX (Wilder) for every period.
+    Returns (plus_di , minus_di , adx) , each one a matrix (bars x periods) with NaN during the warm up
+    '''
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    n = len(high)
+    tr = true_range(high, low, close)
+    up_move = np.concatenate(([np.nan], high[1:] - high[:-1]))
+    down_move = np.concatenate(([np.nan], low[:-1] - low[1:]))
+    dm_plus = np.where(up_move > down_move, np.maximum(up_move, 0), 0.0)
+    dm_minus = np.where(down_move > up_move, np.maximum(down_move, 0), 0.0)
+    plus_di = np.full((n, len(periods)), np.nan)
+    minus_di = np.full((n, len(periods)), np.nan)
+    adx = np.full((n, len(periods)), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        for j, p in enumerate(periods) :
+            p = int(p)
+            if n <= p :
+                continue
+            tr_n = _wilder(tr[p:], p, tr[1:p+1].sum())
+            plus_di[p:, j] = 100 * _wilder(dm_plus[p:], p, dm_plus[1:p+1].sum()) / tr_n
+            minus_di[p:, j] = 100 * _wilder(dm_minus[p:], p, dm_minus[1:p+1].sum()) / tr_n
+            dx = 100 * np.abs(plus_di[:, j] - minus_di[:, j]) / (plus_di[:, j] + minus_di[:, j])
+            if n >= 2 * p :
+                seed = dx[p:2*p].mean()
+                w = dx[2*p-1:].copy()
+                w[0] = seed
+                adx[2*p-1:, j] = pd.Series(w).ewm(alpha=1/p, adjust=False).mean().to_numpy()
+    return plus_di, minus_di, adx
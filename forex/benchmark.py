@@ -0,0 +1,285 @@
+'''
+Offline benchmark of forex_backtest_class (no yfinance , no network).
+Synthetic OHLCV bars (seeded random walk with regimes and gaps) are written to a csv folder once and loaded through
+the Csv_Store path , then every best_param_* optimizer , a strided grid of every strategy and every *_backtest is timed
+at several sizes. Wall time , peak memory (tracemalloc , in a separate run) and a checksum of the result are recorded for each case ,
+and a run can be saved as baseline or compared with one to flag slower cases and changed results.
+Grid cells of grid_scores are checked against the per-couple strategy methods on resampled bars with gaps.
+The import time of the compute core is checked against a budget : myforexclass must import without the plotting
+and data source backends (HEAVY_MODULES) , they are loaded on first use.
+
+    python benchmark.py --sizes 1000 100000 --save bench_baseline.json
+    python benchmark.py --sizes 1000 100000 --compare bench_baseline.json --threshold 0.25
+'''
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import product
+import numpy as np
+import pandas as pd
+
+SIZES = (1_000, 100_000, 2_000_000)
+STRIDES = (1, 4) # grid sizes : every value of param_space , every 4th value
+BACKTEST_PARAMS = {"sma": (20, 60), "ema": (20, 60), "dema": (15, 50), "rsi": (14, 30, 70), "macd": (12, 26, 9),
+                   "bollinger": (20, 2), "stochastic": (14, 3), "ichimoku": (9, 26, 52)}
+HEAVY_MODULES = ("matplotlib", "cufflinks", "plotly", "yfinance", "ta")
+IMPORT_BUDGET = 1.5 # seconds to import myforexclass in a new interpreter
+GRID_SAMPLES = 8 # couples of every strategy checked against its per-couple method
+REGIMES = ((0.00002, 0.0004), (-0.00002, 0.0006), (0.0, 0.0002), (0.00001, 0.0012)) # (drift , volatility) of 1 bar
+
+#******************************************************* Synthetic Data ***********************************************
+def synthetic_ohlcv(bars, seed=0, interval="1min", start="2000-01-03", regime_bars=5000, gap_rate=0.0005, gap_bars=240):
+    '''
+    Seeded random walk OHLCV bars with regimes and gaps
+    bars        : number of bars
+    regime_bars : mean length of a regime (drift and volatility of REGIMES) , regimes switch like a Markov chain
+    gap_rate    : probability that a bar follows a gap (missing bars , like a closed market) with a price jump
+    gap_bars    : longest gap (bars)
+    Returns DataFrame of Open , High , Low , Close , Volume with "Datetime" index
+    '''
+    rng = np.random.default_rng(seed)
+    switch = rng.random(bars) < 1.0 / regime_bars
+    state = rng.integers(0, len(REGIMES), switch.sum() + 1)[np.cumsum(switch)]
+    drift, vol = np.array(REGIMES).T[:, state]
+    gap = rng.random(bars) < gap_rate
+    gap[0] = False
+    steps = np.ones(bars, dtype=np.int64)
+    steps[gap] += rng.integers(1, gap_bars + 1, gap.sum())
+    returns = rng.normal(drift, vol)
+    jumps = np.where(gap, rng.normal(0.0, vol * 10), 0.0)
+    close = 100 * np.exp(np.cumsum(returns + jumps))
+    open = np.concatenate(([100.0], close[:-1])) * np.exp(jumps)
+    wick = np.abs(rng.normal(0.0, vol, (2, bars)))
+    high = np.maximum(open, close) * np.exp(wick[0])
+    low = np.minimum(open, close) * np.exp(-wick[1])
+    volume = np.round(rng.lognormal(6.0, 0.5, bars) * vol / REGIMES[0][1])
+    step = pd.Timedelta(interval)
+    index = pd.DatetimeIndex(pd.Timestamp(start) + step * (np.cumsum(steps) - 1), name="Datetime")
+    return pd.DataFrame({"Open": open, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+def write_dataset(folder, bars, seed=0, interval="1min"):
+    '''
+    Csv of synthetic bars for Csv_Store (written once , its name has the size and the seed)
+    Returns (ticker , first date , last date)
+    '''
+    ticker = "SYN{}_S{}".format(bars, seed)
+    path = os.path.join(folder, ticker + ".csv")
+    os.makedirs(folder, exist_ok=True)
+    if os.path.exists(path) :
+        dates = pd.read_csv(path, usecols=["Datetime"]).Datetime
+        return ticker, dates.iloc[0], dates.iloc[-1]
+    df = synthetic_ohlcv(bars, seed, interval)
+    df.to_csv(path)
+    return ticker, str(df.index[0]), str(df.index[-1])
+
+#******************************************************* Cases ********************************************************
+def checksum(result):
+    '''
+    Short hash of a result (arrays by their values rounded to 8 digits)
+    '''
+    if isinstance(result, np.ndarray) :
+        data = np.round(result.astype(np.float64), 8).tobytes()
+    else :
+        data = repr(result).encode()
+    return hashlib.sha1(data).hexdigest()[:12]
+
+def measure(func, repeat=1, memory=True):
+    '''
+    Run func repeat times , returns (best wall time , peak MB , result)
+    Memory is traced in one more run , tracing slows the code down and is kept out of the timed runs.
+    print output of func is dropped , it is not part of the measured work of a study
+    '''
+    best = np.inf
+    peak = np.nan
+    for _ in range(repeat) :
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) :
+            result = func()
+        best = min(best, time.perf_counter() - begin)
+    if memory :
+        del result
+        tracemalloc.start()
+        try :
+            with contextlib.redirect_stdout(io.StringIO()) :
+                result = func()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally :
+            tracemalloc.stop()
+    return best, peak, result
+
+def strided_space(space, stride):
+    '''
+    Every stride-th value of each range of a param_space
+    '''
+    return tuple(r[::stride] for r in space)
+
+def cases(fx, ticker, strategies, strides):
+    '''
+    (name , function) of every measured case of one loaded ticker
+    '''
+    for strategy in strategies :
+        yield "best_param_" + strategy, lambda s=strategy : getattr(fx, "best_param_" + s)(ticker)
+        space = fx.param_space(strategy, len(fx.ohlcv[ticker]))
+        for stride in strides :
+            if stride == 1 :
+                continue
+            grid = strided_space(space, stride)
+            yield "grid_{}_x{}".format(strategy, len(list(product(*grid)))), lambda s=strategy , g=grid : fx.grid_scores(ticker, s, g)
+        yield strategy + "_backtest", lambda s=strategy : getattr(fx, s + "_backtest")(ticker, *BACKTEST_PARAMS[s])
+
+def run(sizes=SIZES, strategies=None, strides=STRIDES, folder="bench_data", seed=0, repeat=1, memory=True, spread=0.0001):
+    '''
+    Measure every case at every size , returns dict of case name -> {"seconds" , "peak_mb" , "checksum"}
+    (the indicator cache is cleared before each run so cases and repeats do not share work)
+    '''
+    import myforexclass as mf
+    strategies = list(strategies or mf.forex_backtest_class.strategies)
+    results = {}
+    for bars in sizes :
+        ticker, start, end = write_dataset(folder, bars, seed)
+        seconds, peak, fx = measure(lambda : mf.forex_backtest_class([ticker], start, end, "", spread, 1000, source=folder), 1, memory)
+        results["{}/load".format(bars)] = {"seconds": seconds, "peak_mb": peak, "checksum": checksum(fx.ohlcv[ticker].close)}
+        for name, func in cases(fx, ticker, strategies, strides) :
+            cold = lambda f=func : (fx.cache.clear(), f())[1] # every run starts with an empty indicator cache
+            seconds, peak, result = measure(cold, repeat, memory)
+            results["{}/{}".format(bars, name)] = {"seconds": seconds, "peak_mb": peak, "checksum": checksum(result)}
+            print("{:>10} {:<28} {:9.4f} s {:9.1f} MB".format(bars, name, seconds, peak), flush=True)
+    return results
+
+#******************************************************* Grid Check ***************************************************
+def check_grids(folder="bench_data", bars=60_000, seed=0, strategies=None, samples=GRID_SAMPLES, interval="1h", spread=0.0001):
+    '''
+    Cells of grid_scores against the per-couple strategy methods (sma() , rsi() , ...) for sampled couples of param_space.
+    One minute synthetic bars are resampled to interval , so empty bins (gaps) are dropped bars like weekends of real data.
+    bollinger is left out , its grid scores the bollinger_backtest state machine and not bollinger().
+    Returns list of problems
+    '''
+    import myforexclass as mf
+    strategies = [s for s in (strategies or mf.forex_backtest_class.strategies) if s != "bollinger"]
+    ticker, start, end = write_dataset(folder, bars, seed)
+    with contextlib.redirect_stdout(io.StringIO()) :
+        fx = mf.forex_backtest_class([ticker], start, end, interval, spread, 1000, source=folder)
+    rng = np.random.default_rng(seed)
+    problems = []
+    for strategy in strategies :
+        space = fx.param_space(strategy, len(fx.ohlcv[ticker]))
+        couples = list(product(*space))
+        grid = np.round(fx.grid_scores(ticker, strategy, space).ravel(), 5)
+        worst = 0.0
+        for i in rng.choice(len(couples), min(samples, len(couples)), replace=False) :
+            with contextlib.redirect_stdout(io.StringIO()) :
+                perf = getattr(fx, strategy)(ticker, *couples[i])
+            perf = perf[1] if isinstance(perf, tuple) else perf # ichimoku returns (frame , perf)
+            if not np.isclose(grid[i], perf, rtol=0, atol=1e-5, equal_nan=True) :
+                worst = max(worst, abs(grid[i] - perf))
+                problems.append("{} grid {} is {} , {}() gives {}".format(strategy, couples[i], grid[i], strategy, perf))
+        print("{:>10} {:<28} {:9.5f}   {}".format("grid", strategy, worst, "ok" if not worst else "FAIL"), flush=True)
+    return problems
+
+#******************************************************* Import Time **************************************************
+def import_time(module="myforexclass", repeat=3):
+    '''
+    Best time (seconds) to import module in a new interpreter and the HEAVY_MODULES it loaded
+    '''
+    code = ("import sys , time , json ; begin = time.perf_counter() ; import {} ; seconds = time.perf_counter() - begin ; "
+            "print(json.dumps([seconds , [m for m in {!r} if m in sys.modules]]))").format(module, HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = np.inf, []
+    for _ in range(repeat) :
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True).stdout
+        seconds, heavy = json.loads(out.splitlines()[-1])
+        best = min(best, seconds)
+    return best, heavy
+
+def check_import(module="myforexclass", budget=IMPORT_BUDGET):
+    '''
+    Import time of module against the budget , returns (seconds , list of problems)
+    '''
+    seconds, heavy = import_time(module)
+    problems = []
+    if seconds > budget :
+        problems.append("import of {} took {:.3f} s (budget {:.3f} s)".format(module, seconds, budget))
+    if heavy :
+        problems.append("import of {} loaded {}".format(module, ", ".join(heavy)))
+    print("{:>10} {:<28} {:9.4f} s {}".format("import", module, seconds, "ok" if not problems else "FAIL"), flush=True)
+    return seconds, problems
+
+#******************************************************* Baseline *****************************************************
+def save_baseline(path, results):
+    '''
+    Write results with the versions they were measured with
+    '''
+    meta = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(), "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(path, "w") as f :
+        json.dump({"meta": meta, "cases": results}, f, indent=1)
+
+def compare(results, baseline, threshold=0.25, noise=0.05):
+    '''
+    Table of every case against the baseline cases
+    threshold : relative slow down flagged as regression (0.25 = 25% slower)
+    noise     : cases faster than this (seconds) in both runs are never flagged
+    status is "ok" , "slower" , "faster" , "changed" (different checksum) or "new"
+    '''
+    rows = []
+    for name, now in results.items() :
+        base = baseline.get(name)
+        if base is None :
+            rows.append((name, now["seconds"], np.nan, np.nan, now["peak_mb"], np.nan, "new"))
+            continue
+        ratio = now["seconds"] / base["seconds"] if base["seconds"] > 0 else np.inf
+        status = "ok"
+        if now["checksum"] != base["checksum"] :
+            status = "changed"
+        elif max(now["seconds"], base["seconds"]) >= noise and ratio > 1 + threshold :
+            status = "slower"
+        elif max(now["seconds"], base["seconds"]) >= noise and ratio < 1 / (1 + threshold) :
+            status = "faster"
+        rows.append((name, now["seconds"], base["seconds"], ratio, now["peak_mb"], base["peak_mb"], status))
+    return pd.DataFrame(rows, columns=["case", "seconds", "base_seconds", "ratio", "peak_mb", "base_peak_mb", "status"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of forex_backtest_class")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="number of bars of each dataset")
+    parser.add_argument("--strategies", nargs="+", default=None, help="strategies to measure (default all)")
+    parser.add_argument("--strides", type=int, nargs="+", default=list(STRIDES), help="grid sizes as strides of param_space")
+    parser.add_argument("--folder", default="bench_data", help="folder of synthetic csv files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each case , the best time is kept")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace memory (faster runs)")
+    parser.add_argument("--save", help="write the results as baseline json")
+    parser.add_argument("--compare", help="baseline json to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slow down flagged as regression")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="seconds allowed to import myforexclass")
+    args = parser.parse_args(argv)
+
+    seconds, problems = check_import(budget=args.import_budget)
+    problems += check_grids(args.folder, seed=args.seed)
+    results = run(args.sizes, args.strategies, args.strides, args.folder, args.seed, args.repeat, not args.no_memory)
+    results["import/myforexclass"] = {"seconds": seconds, "peak_mb": np.nan, "checksum": ""}
+    if args.save :
+        save_baseline(args.save, results)
+    if args.compare :
+        with open(args.compare) as f :
+            baseline = json.load(f)["cases"]
+        table = compare(results, baseline, args.threshold)
+        with pd.option_context("display.max_rows", None, "display.width", 200) :
+            print(table.to_string(index=False, float_format="{:.4f}".format))
+        bad = table.status.isin(["slower", "changed"])
+        if bad.any() :
+            print("{} regressions : {}".format(bad.sum(), ", ".join(table.case[bad])))
+            problems.append("regressions")
+    for problem in problems :
+        print(problem)
+    return 1 if problems else 0
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,252 @@
+'''
+Local storage of OHLCV data for forex_backtest_class.
+Bars are kept as columnar numpy arrays (one .npz file per ticker and interval) so repeated runs read them from disk.
+'''
+import os
+import json
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+def _to_ns(value):
+    '''
+    Timestamp (string , date or datetime) as int64 nanoseconds of UTC , naive values are read as UTC
+    '''
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None :
+        stamp = stamp.tz_localize("UTC")
+    return stamp.tz_convert("UTC").value
+
+def _flat_ohlcv(raw):
+    '''
+    Open , High , Low , Close , Volume columns of a downloaded frame as float64
+    (yfinance may return (column , ticker) columns)
+    '''
+    df = pd.DataFrame(index=raw.index)
+    for column in OHLCV_COLUMNS :
+        values = raw[column]
+        df[column] = (values.iloc[:, 0] if isinstance(values, pd.DataFrame) else values).astype(np.float64)
+    return df
+
+def resample_ohlcv(df, interval):
+    '''
+    Bars of a bigger interval : first Open , max High , min Low , last Close and sum of Volume of each bin
+    Bins without any bar are NaN (Volume 0).
+    '''
+    return df.resample(interval).agg({c: OHLCV_AGG[c] for c in df.columns if c in OHLCV_AGG})
+
+def _bound_ns(value, tz, side):
+    '''
+    Start ("left") or end ("right") of a date bound as UTC ns , inclusive like DataFrame.loc[start:end].
+    Strings are read with their own resolution ("2024-01-31" is the whole day) , naive values are in tz.
+    '''
+    if isinstance(value, str) :
+        period = pd.Period(value)
+        stamp = period.start_time if side == "left" else period.end_time
+    else :
+        stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None :
+        stamp = stamp.tz_localize(tz or "UTC")
+    return stamp.tz_convert("UTC").value
+
+def _merge_spans(spans):
+    '''
+    Sorted union of [start , end) spans , shape (k x 2)
+    '''
+    merged = []
+    for start, end in sorted(map(tuple, spans)) :
+        if merged and start <= merged[-1][1] :
+            merged[-1][1] = max(merged[-1][1], end)
+        else :
+            merged.append([start, end])
+    return np.array(merged, dtype=np.int64).reshape(-1, 2)
+
+def missing_spans(spans, start, end):
+    '''
+    Parts of [start , end) not covered by spans (list of (start , end))
+    '''
+    missing = []
+    for s, e in _merge_spans(spans) :
+        if e <= start or s >= end :
+            continue
+        if s > start :
+            missing.append((start, s))
+        start = max(start, e)
+        if start >= end :
+            break
+    if start < end :
+        missing.append((start, end))
+    return missing
+
+#******************************************************* Download Cache *********************************************
+class Download_Cache(object):
+    '''
+    On disk cache of downloaded bars , one file "ticker_interval.npz" per (ticker , interval) with
+    columns time (UTC ns) , Open , High , Low , Close , Volume and the [start , end) spans already downloaded.
+    Requests are served from the file and only the spans that are not covered yet are downloaded.
+    folder   : folder of cache files
+    download : function(ticker , start , end , interval) -> DataFrame of bars (default yfinance) , start and end are tz aware
+               UTC Timestamps (yfinance reads naive dates in the exchange timezone)
+    A span is recorded as covered only when its download returned bars , an empty result (rate limit , error , no bars)
+    is downloaded again next time.
+    '''
+    def __repr__(self):
+        return "Download Cache (folder={})".format(self.folder)
+
+    def __init__(self, folder, download=None):
+        self.folder = folder
+        self.download = download if download is not None else self.yahoo_download
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def yahoo_download(ticker, start, end, interval):
+        import yfinance as yf
+        return yf.download(ticker, start, end, interval=interval)
+
+    def path(self, ticker, interval):
+        return os.path.join(self.folder, "{}_{}.npz".format(ticker, interval).replace("/", "-"))
+
+    def read(self, ticker, interval):
+        '''
+        Stored columns of (ticker , interval) as dict of arrays (empty arrays if there is no file) and tz of the dates
+        '''
+        path = self.path(ticker, interval)
+        if not os.path.exists(path) :
+            store = {c: np.empty(0) for c in OHLCV_COLUMNS}
+            store["time"] = np.empty(0, dtype=np.int64)
+            store["spans"] = np.empty((0, 2), dtype=np.int64)
+            return store, ""
+        with np.load(path) as f :
+            store = {k: f[k] for k in f.files}
+        return store, str(store.pop("tz"))
+
+    def write(self, ticker, interval, store, tz):
+        '''
+        Save columns with a temporary file and a rename , so a stopped run never leaves a broken file
+        '''
+        path = self.path(ticker, interval)
+        temp = path + ".tmp.npz"
+        np.savez(temp, tz=np.array(tz), **store)
+        os.replace(temp, path)
+
+    def load(self, ticker, start, end, interval):
+        '''
+        Bars of ticker in [start , end) as DataFrame (Open , High , Low , Close , Volume) , downloading only missing spans
+        '''
+        store, tz = self.read(ticker, interval)
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+        now_ns = pd.Timestamp.now(tz="UTC").value
+        missing = missing_spans(store["spans"], start_ns, end_ns)
+        if missing :
+            frames , covered = [] , []
+            for s, e in missing :
+                raw = self.download(ticker, pd.Timestamp(s, tz="UTC"), pd.Timestamp(e, tz="UTC"), interval)
+                if raw is not None and len(raw) :
+                    frames.append(_flat_ohlcv(raw))
+                    if s < now_ns : # spans reaching the future are only covered up to now , the rest is downloaded again next time
+                        covered.append((s, min(e, now_ns)))
+            for df in frames :
+                index = pd.DatetimeIndex(df.index)
+                if index.tz is not None :
+                    tz = tz or str(index.tz)
+                    time = index.tz_convert("UTC").as_unit("ns").asi8
+                else :
+                    time = index.tz_localize("UTC").as_unit("ns").asi8
+                keep = ~np.isin(store["time"], time) # new bars replace stored bars of the same time
+                store["time"] = np.concatenate([store["time"][keep], time])
+                for c in OHLCV_COLUMNS :
+                    store[c] = np.concatenate([store[c][keep], df[c].to_numpy()])
+            if frames :
+                order = np.argsort(store["time"], kind="stable")
+                for c in ("time",) + OHLCV_COLUMNS :
+                    store[c] = store[c][order]
+                store["spans"] = _merge_spans(list(map(tuple, store["spans"])) + covered)
+                self.write(ticker, interval, store, tz)
+        lo, hi = np.searchsorted(store["time"], [start_ns, end_ns], side="left")
+        index = pd.DatetimeIndex(store["time"][lo:hi].astype("datetime64[ns]")).tz_localize("UTC")
+        if tz :
+            index = index.tz_convert(tz)
+        else :
+            index = index.tz_localize(None)
+        index.name = "Datetime"
+        return pd.DataFrame({c: store[c][lo:hi] for c in OHLCV_COLUMNS}, index=index)
+
+#******************************************************* CSV Store **************************************************
+class Csv_Store(object):
+    '''
+    Fast reader of "ticker.csv" files of a folder (column of date must be "Datetime").
+    The first read converts a csv to a sidecar folder "ticker.bars" with one .npy file per column
+    (time as UTC ns sorted , Open , High , Low , Close , Volume). Later reads memory map the columns ,
+    binary search the dates and only touch the rows of the range. The sidecar is rebuilt when the csv changes.
+    folder : folder of csv files
+    '''
+    def __repr__(self):
+        return "CSV Store (folder={})".format(self.folder)
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def csv_path(self, ticker):
+        return os.path.join(self.folder, ticker + ".csv")
+
+    def sidecar_path(self, ticker):
+        return os.path.join(self.folder, ticker + ".bars")
+
+    def _csv_stamp(self, ticker):
+        info = os.stat(self.csv_path(ticker))
+        return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+    def build(self, ticker):
+        '''
+        Convert ticker.csv to its sidecar and return the meta data
+        '''
+        stamp = self._csv_stamp(ticker)
+        raw = pd.read_csv(self.csv_path(ticker), parse_dates=["Datetime"], index_col=["Datetime"])
+        index = pd.DatetimeIndex(raw.index)
+        tz = str(index.tz) if index.tz is not None else ""
+        time = (index.tz_convert("UTC") if tz else index.tz_localize("UTC")).as_unit("ns").asi8
+        order = np.argsort(time, kind="stable")
+        folder = self.sidecar_path(ticker)
+        os.makedirs(folder, exist_ok=True)
+        np.save(os.path.join(folder, "time.npy"), time[order])
+        for c in OHLCV_COLUMNS :
+            np.save(os.path.join(folder, c + ".npy"), raw[c].to_numpy(dtype=np.float64)[order])
+        meta = dict(stamp, tz=tz, rows=len(time))
+        with open(os.path.join(folder, "meta.json"), "w") as f :
+            json.dump(meta, f)
+        return meta
+
+    def meta(self, ticker):
+        '''
+        Meta data of the sidecar , building it first if it is missing or older than the csv
+        '''
+        path = os.path.join(self.sidecar_path(ticker), "meta.json")
+        if os.path.exists(path) :
+            with open(path) as f :
+                meta = json.load(f)
+            stamp = self._csv_stamp(ticker)
+            if meta["size"] == stamp["size"] and meta["mtime_ns"] == stamp["mtime_ns"] :
+                return meta
+        return self.build(ticker)
+
+    def load(self, ticker, start, end, interval=None):
+        '''
+        Bars of ticker between start and end (both included like DataFrame.loc) as DataFrame ,
+        resampled to interval with resample_ohlcv (None keeps the bars of the file)
+        '''
+        meta = self.meta(ticker)
+        folder = self.sidecar_path(ticker)
+        tz = meta["tz"]
+        time = np.load(os.path.join(folder, "time.npy"), mmap_mode="r")
+        lo = np.searchsorted(time, _bound_ns(start, tz, "left"), side="left")
+        hi = np.searchsorted(time, _bound_ns(end, tz, "right"), side="right")
+        index = pd.DatetimeIndex(np.array(time[lo:hi]).view("datetime64[ns]")).tz_localize("UTC")
+        index = index.tz_convert(tz) if tz else index.tz_localize(None)
+        index.name = "Datetime"
+        columns = {c: np.array(np.load(os.path.join(folder, c + ".npy"), mmap_mode="r")[lo:hi]) for c in OHLCV_COLUMNS}
+        df = pd.DataFrame(columns, index=index)
+        if interval :
+            df = resample_ohlcv(df, interval)
+        return df
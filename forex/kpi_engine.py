@@ -0,0 +1,262 @@
+'''
+KPIs of many equity curves (strategies , parameter sets , tickers) in one vectorized pass.
+Curves are the columns of a matrix (bars x curves) , like the equity matrix of backtest_engine.pnl_kernel(... , curves=True) ,
+so thousands of grid results are ranked by risk adjusted return without a Python loop per curve.
+Returns are log returns like Ticker_Data.returns , NaN bars (before the first trade of a curve) are not counted.
+'''
+import numpy as np
+import pandas as pd
+import backtest_engine as be
+
+KPI_COLUMNS = ["bars", "cagr", "volatility", "sharpe", "sortino", "max_drawdown",
+               "mdd_peak", "mdd_trough", "mdd_recovery", "mdd_bars", "calmar"]
+BARS_PER_YEAR = 365 # default of every function , same as period of the KPI methods of forex_backtest_class
+
+def _as_matrix(curves):
+    '''
+    (matrix bars x curves , names of curves) of a DataFrame , Series or array , a 1-D array is one curve
+    '''
+    if isinstance(curves, pd.DataFrame) :
+        return curves.to_numpy(dtype=np.float64), list(curves.columns)
+    if isinstance(curves, pd.Series) :
+        return curves.to_numpy(dtype=np.float64)[:, None], [curves.name]
+    values = np.asarray(curves, dtype=np.float64)
+    if values.ndim == 1 :
+        values = values[:, None]
+    return values, list(range(values.shape[1]))
+
+def log_returns(curves, kind="equity"):
+    '''
+    Log returns of every column , NaN where a bar has no return
+    kind : "equity" (values of the curves) or "returns" (curves already are log returns)
+    '''
+    values = _as_matrix(curves)[0]
+    if kind == "returns" :
+        return values
+    if kind != "equity" :
+        raise ValueError("Unknown kind {}".format(kind))
+    returns = np.full(values.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        returns[1:] = np.log(values[1:] / values[:-1])
+    return returns
+
+def drawdown_stats(returns):
+    '''
+    Maximum drawdown of every column of a log return matrix and its duration
+    Returns dict of arrays :
+        max_drawdown : lowest equity / running peak - 1 (0 or negative)
+        mdd_peak , mdd_trough : rows of the peak before the maximum drawdown and of its bottom
+        mdd_recovery : first row after the trough back at the peak , -1 if the curve has not recovered
+                       (curves without any drawdown have peak , trough and recovery in the same row)
+        mdd_bars : bars from the peak to the recovery (or to the last bar when not recovered)
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    n, cols = returns.shape
+    level = np.nancumsum(returns, axis=0) # log equity , missing bars keep the last value
+    peak = np.maximum.accumulate(np.maximum(level, 0.0), axis=0) # equity starts at 1 before the first bar
+    depth = level - peak
+    rows = np.arange(n)[:, None]
+    trough = np.argmin(depth, axis=0) if n else np.zeros(cols, dtype=np.int64)
+    at_peak = np.where(depth == 0, rows, -1)
+    np.maximum.accumulate(at_peak, axis=0, out=at_peak)
+    col = np.arange(cols)
+    peak_row = at_peak[trough, col] if n else trough
+    peak_row = np.maximum(peak_row, 0)
+    back = (rows > trough[None, :]) & (depth >= 0)
+    recovered = back.any(axis=0)
+    recovery = np.where(recovered, np.argmax(back, axis=0), -1)
+    mdd = np.expm1(depth[trough, col]) if n else np.zeros(cols)
+    bars = np.where(recovered, recovery, n - 1) - peak_row
+    flat = mdd == 0 # never under the peak
+    bars[flat] = 0
+    recovery[flat] = trough[flat]
+    return {"max_drawdown": mdd, "mdd_peak": peak_row, "mdd_trough": trough,
+            "mdd_recovery": recovery, "mdd_bars": bars}
+
+def _kpi_block(returns, bars_per_year, risk_free_rate):
+    '''
+    KPI arrays of one block of columns of a log return matrix
+    '''
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=0)
+    total = np.nansum(returns, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        mean = total / count
+        centered = np.where(valid, returns - mean, 0.0)
+        volatility = np.sqrt(np.where(count > 1, (centered**2).sum(axis=0) / (count - 1), np.nan) * bars_per_year)
+        cagr = np.expm1(total * bars_per_year / count)
+        down = np.where(valid & (returns < 0), returns, 0.0)
+        down_count = (down < 0).sum(axis=0)
+        downside = np.sqrt((down**2).sum(axis=0) / down_count * bars_per_year)
+        excess = cagr - risk_free_rate
+        stats = drawdown_stats(returns)
+        sharpe = excess / volatility
+        sortino = np.where(down_count > 0, excess / downside, np.inf)
+        calmar = cagr / np.abs(stats["max_drawdown"])
+    stats.update({"bars": count, "cagr": cagr, "volatility": volatility,
+                  "sharpe": sharpe, "sortino": sortino, "calmar": calmar})
+    return stats
+
+def kpi_table(curves, bars_per_year=BARS_PER_YEAR, kind="equity", risk_free_rate=0.0):
+    '''
+    CAGR , annualized volatility , Sharpe , Sortino , maximum drawdown with its duration and Calmar of every curve
+    curves        : DataFrame , Series or matrix (bars x curves) of equity (kind="equity") or log returns (kind="returns")
+    bars_per_year : number of bars in one year (default 365 like forex_backtest_class.kpis , 252 for trading days ,
+                    252*24 for hourly forex , ...)
+    risk_free_rate: annualized risk free rate subtracted from CAGR in Sharpe and Sortino
+    Sharpe = (CAGR - risk free) / volatility , Sortino uses the volatility of negative returns , Calmar = CAGR / |MDD|
+    Returns DataFrame with one row per curve and KPI_COLUMNS , drawdown rows are row numbers of the curves
+    (big matrices are scored in blocks of columns , see backtest_engine.GRID_BLOCK_SIZE)
+    '''
+    names = _as_matrix(curves)[1]
+    returns = log_returns(curves, kind)
+    n, cols = returns.shape
+    step = max(1, be.GRID_BLOCK_SIZE // max(1, n))
+    table = {c : np.empty(cols) for c in KPI_COLUMNS}
+    for lo in range(0, cols, step) :
+        block = _kpi_block(returns[:, lo:lo+step], bars_per_year, risk_free_rate)
+        for c in KPI_COLUMNS :
+            table[c][lo:lo+step] = block[c]
+    table = pd.DataFrame(table, index=names, columns=KPI_COLUMNS)
+    for c in ("bars", "mdd_peak", "mdd_trough", "mdd_recovery", "mdd_bars") :
+        table[c] = table[c].astype(np.int64)
+    return table
+
+def rank_kpis(table, by="sharpe", top=None, ascending=False):
+    '''
+    Rows of a kpi_table sorted by one KPI (NaN last) , top : keep only the first rows
+    '''
+    ranked = table.sort_values(by, ascending=ascending, na_position="last", kind="stable")
+    return ranked if top is None else ranked.head(top)
+
+#******************************************************* Rolling KPIs *************************************************
+def _one_curve(curve, kind):
+    '''
+    1-D log returns of one curve (Series , array or one column matrix)
+    '''
+    returns = log_returns(curve, kind)
+    if returns.shape[1] != 1 :
+        raise ValueError("Rolling KPIs need one curve , got {}".format(returns.shape[1]))
+    return returns[:, 0]
+
+def _window_sums(values, windows):
+    '''
+    Sum of values over the last w bars for every window from one cumulative sum , matrix (bars x windows) , NaN until w bars
+    '''
+    n = len(values)
+    total = np.concatenate(([0.0], np.cumsum(values)))
+    out = np.full((n, len(windows)), np.nan)
+    for j, w in enumerate(windows) :
+        if w <= n :
+            out[w-1:, j] = total[w:] - total[:n-w+1]
+    return out
+
+def window_max(x, windows):
+    '''
+    Max of x over the last w bars for every window in O(n) per window (van Herk / Gil-Werman : max of the suffix
+    of one block and the prefix of the next , the vectorized form of a monotonic queue) , NaN until w bars
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    out = np.full((n, len(windows)), np.nan)
+    for j, w in enumerate(windows) :
+        if w > n :
+            continue
+        blocks = -(-n // w)
+        padded = np.full(blocks * w, -np.inf)
+        padded[:n] = x
+        padded = padded.reshape(blocks, w)
+        prefix = np.maximum.accumulate(padded, axis=1).ravel()[:n]
+        suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()[:n]
+        out[w-1:, j] = np.maximum(suffix[:n-w+1], prefix[w-1:])
+    return out
+
+def rolling_volatility(returns, windows, bars_per_year=BARS_PER_YEAR):
+    '''
+    Annualized standard deviation (ddof=1) of log returns over the last w bars for every window (matrix bars x windows)
+    Built from cumulative sums of the returns and their squares , NaN bars are not counted.
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = ~np.isnan(returns)
+    shift = returns[valid].mean() if valid.any() else 0.0 # sums of centered values keep their precision
+    centered = np.where(valid, returns - shift, 0.0)
+    count = _window_sums(valid.astype(np.float64), windows)
+    total = _window_sums(centered, windows)
+    squares = _window_sums(centered**2, windows)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        var = (squares - total**2 / count) / (count - 1)
+        var[count < 2] = np.nan
+    return np.sqrt(np.maximum(var, 0.0) * bars_per_year)
+
+def rolling_cagr(returns, windows, bars_per_year=BARS_PER_YEAR):
+    '''
+    Compound annual growth rate of the last w bars for every window (matrix bars x windows)
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = ~np.isnan(returns)
+    count = _window_sums(valid.astype(np.float64), windows)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        return np.expm1(_window_sums(np.where(valid, returns, 0.0), windows) * bars_per_year / count)
+
+def rolling_sharpe(returns, windows, bars_per_year=BARS_PER_YEAR, risk_free_rate=0.0):
+    '''
+    (rolling CAGR - risk free) / rolling volatility of the last w bars for every window , like sharpe of kpi_table
+    '''
+    with np.errstate(divide="ignore", invalid="ignore") :
+        return (rolling_cagr(returns, windows, bars_per_year) - risk_free_rate) / rolling_volatility(returns, windows, bars_per_year)
+
+def rolling_sortino(returns, windows, bars_per_year=BARS_PER_YEAR, risk_free_rate=0.0):
+    '''
+    (rolling CAGR - risk free) / annualized deviation of the negative log returns of the last w bars , like sortino of kpi_table
+    (inf when the window has no negative return)
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    down = np.where(returns < 0, returns, 0.0)
+    down_count = _window_sums((down < 0).astype(np.float64), windows)
+    with np.errstate(divide="ignore", invalid="ignore") :
+        downside = np.sqrt(_window_sums(down**2, windows) / down_count * bars_per_year)
+        excess = rolling_cagr(returns, windows, bars_per_year) - risk_free_rate
+        return np.where(down_count > 0, excess / downside, np.where(np.isnan(excess), np.nan, np.inf))
+
+def running_drawdown(returns):
+    '''
+    Equity / running peak - 1 of every bar and bars under water (bars since the last peak)
+    Returns (drawdown , under_water) 1-D arrays
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    level = np.nancumsum(returns)
+    depth = level - np.maximum.accumulate(np.maximum(level, 0.0))
+    rows = np.arange(len(level))
+    last_peak = np.maximum.accumulate(np.where(depth == 0, rows, -1)) if len(level) else rows
+    return np.expm1(depth), rows - last_peak
+
+def rolling_drawdown(returns, windows):
+    '''
+    Equity / highest equity of the last w bars - 1 for every window (matrix bars x windows)
+    '''
+    level = np.nancumsum(np.asarray(returns, dtype=np.float64))
+    return np.expm1(level[:, None] - window_max(level, windows))
+
+def rolling_kpis(curve, windows, bars_per_year=BARS_PER_YEAR, kind="equity", risk_free_rate=0.0):
+    '''
+    Rolling volatility , Sharpe , Sortino and drawdown of one curve for several windows at once , with its running
+    drawdown and bars under water , to watch how a strategy decays. Every KPI costs O(bars) per window.
+    curve   : Series or array of equity (kind="equity") or log returns (kind="returns")
+    windows : int or list of window lengths (bars)
+    Returns DataFrame with columns (kpi , window) , running KPIs have window 0 , index of the curve if it is a Series
+    '''
+    windows = [int(w) for w in np.atleast_1d(windows)]
+    returns = _one_curve(curve, kind)
+    drawdown, under_water = running_drawdown(returns)
+    parts = {"volatility": rolling_volatility(returns, windows, bars_per_year),
+             "sharpe": rolling_sharpe(returns, windows, bars_per_year, risk_free_rate),
+             "sortino": rolling_sortino(returns, windows, bars_per_year, risk_free_rate),
+             "drawdown": rolling_drawdown(returns, windows)}
+    columns, values = [], []
+    for name, bank in parts.items() :
+        columns += [(name, w) for w in windows]
+        values.append(bank)
+    columns += [("drawdown", 0), ("under_water", 0)]
+    values += [drawdown[:, None], under_water[:, None].astype(np.float64)]
+    index = curve.index if isinstance(curve, (pd.Series, pd.DataFrame)) else None
+    return pd.DataFrame(np.hstack(values), index=index, columns=pd.MultiIndex.from_tuples(columns, names=["kpi", "window"]))
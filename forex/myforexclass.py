@@ -1,12 +1,30 @@
 import csv
+import time
 import pandas as pd
 import numpy as np
-import ta
-import yfinance as yf
-import matplotlib.pyplot as plt
 from itertools import product
-import cufflinks as cf
-from plotly.offline import iplot
+import backtest_engine as be
+import data_store as ds
+import strategy_api as sa
+import kpi_engine as ke
+import profiling as pf
+import param_search as pm
+
+# Plotting and yfinance are loaded on first use , so workers that only compute never import them
+def pyplot():
+    '''
+    matplotlib.pyplot (loaded on first call)
+    '''
+    import matplotlib.pyplot as plt
+    return plt
+
+def interactive_plotting():
+    '''
+    cufflinks (DataFrame.iplot) and plotly iplot for notebooks (loaded on first call)
+    '''
+    import cufflinks as cf
+    from plotly.offline import iplot
+    return cf , iplot
 
 class forex_backtest_class():
     '''
@@ -17,6 +35,14 @@ class forex_backtest_class():
         spread : spread of this instrument as string
         amount : How much capital do you want to trade with? as string
         source = source of data : none for using yahoo finance and "address of folder" to use your data ex :"c:/data" name of file must be "ticker.csv" and name of column of date must be "Datetime"
+                 (the first read saves a binary copy "ticker.bars" next to the csv , later reads use it)
+        cache_mb = memory budget (MB) of indicator cache shared by optimizers and backtests
+        cache_dir = folder of downloaded data cache ("" for downloading every time) , yahoo data is kept there and only missing dates are downloaded
+        shared = dict of ticker -> descriptor from share_data() of another instance , data is attached from shared memory instead of loading
+        profile = if True , time and count the stages of every call in self.profiler (profiling.Stage_Profiler) ,
+                  read it with profile_table() or profile_json() , when False the hooks cost almost nothing
+        trade_view = backtest_engine.Trade_View that prints the fills of buy_instrument / sell_instrument
+                     (default prints all , Trade_View(max_lines=0) keeps them only in self.ledger)
     '''
 
     def __repr__(self): 
@@ -25,8 +51,11 @@ class forex_backtest_class():
         '''
         return "Forex (start={} , end={} , interval={} )".format(self.start,self.end, self.interval)
     
-    def __init__ (self ,tickers , start ,end ,interval , spread=0 , amount=0 , source=""):
+    def __init__ (self ,tickers , start ,end ,interval , spread=0 , amount=0 , source="" , cache_mb=256 , cache_dir="" , shared=None , profile=False , trade_view=None):
+        self.profiler= pf.Stage_Profiler(profile)
         self.source= source
+        self.cache_dir= cache_dir
+        self.shared= shared
         self.tickers = tickers
         self.start= start
         self.end = end
@@ -36,51 +65,127 @@ class forex_backtest_class():
         self.current_balance= amount
         self.units = 0
         self.trades= 0
+        self.ledger= be.Trade_Ledger(spread) # fills of the last backtest (or of buy / sell / close calls)
+        self.search_info= None # result of the last search_params (params , score , seed , cost , ...)
+        self.trade_view= be.Trade_View() if trade_view is None else trade_view
         self.symbol=""
         self.data=pd.DataFrame()
         self.temp_data=pd.DataFrame()
+        self.ohlcv={}
+        self.cache= be.Indicator_Cache(int(cache_mb * 2**20))
         self.get_data()
         
 #******************************************************* Get Data and Back Testing *********************************** 
+    @pf.profiled()
     def get_data(self):
         '''
         Get Data from Yahoo Finance OR your csv file and calculate hold strategy
+        Each ticker keeps its own valid bars in self.ohlcv (backtest_engine.Ticker_Data) , self.data joins all tickers
+        and has NaN where a ticker has no bar.
         '''
-        data=pd.DataFrame()
-        if self.source == ""  :
+        self.ohlcv={}
+        if self.shared :
+            for ticker in self.tickers :
+                self.ohlcv[ticker]= be.attach_ticker_data(self.shared[ticker]) # zero copy views of shared memory
+        elif self.source == ""  :
             for ticker in self.tickers :
-                raw = yf.download (ticker , self.start , self.end , interval=self.interval)
-                data[ticker+"_open"]=raw["Open"]
-                data[ticker+"_close"]=raw["Close"]
-                data[ticker+"_high"]=raw["High"]
-                data[ticker+"_low"]=raw["Low"]
-                data[ticker+"_volume"]=raw["Volume"]
-                data[ticker+"_returns"] = np.log(data[ticker+"_close"] / data[ticker+"_close"].shift(1))
-                data[ticker+"_cum_return"] = np.exp(data[ticker+"_returns"].cumsum())
+                if self.cache_dir :
+                    raw = ds.Download_Cache(self.cache_dir).load(ticker , self.start , self.end , self.interval)
+                else :
+                    raw = ds.Download_Cache.yahoo_download(ticker , self.start , self.end , self.interval)
+                self.add_ticker_data(ticker , raw)
                 print("Data of {} downloded.".format(ticker))
         else :
             for ticker in self.tickers :
-                address= self.source+"/"+ticker+".csv"
-                raw=pd.read_csv(address, parse_dates=["Datetime"] , index_col=["Datetime"])
-                raw=raw.loc[self.start:self.end].copy()
-                raw=raw.resample(self.interval).last()
-                data[ticker+"_open"]=raw["Open"]
-                data[ticker+"_close"]=raw["Close"]
-                data[ticker+"_high"]=raw["High"]
-                data[ticker+"_low"]=raw["Low"]
-                data[ticker+"_volume"]=raw["Volume"]
-                data[ticker+"_returns"] = np.log(data[ticker+"_close"] / data[ticker+"_close"].shift(1))
-                data[ticker+"_cum_return"] = np.exp(data[ticker+"_returns"].cumsum())
+                raw=ds.Csv_Store(self.source).load(ticker , self.start , self.end , self.interval) # binary sidecar of the csv , OHLCV resampling
+                self.add_ticker_data(ticker , raw)
                 print("Data of {} loded.".format(ticker))
-                
-        data.dropna(inplace=True)
-        self.data=data.copy()
-        self.temp_data=data.copy()
+
+        names= {"Open":"_open" , "Close":"_close" , "High":"_high" , "Low":"_low" , "Volume":"_volume" , "returns":"_returns" , "cum_return":"_cum_return"}
+        frames= [self.ohlcv[ticker].to_frame(names).rename(columns={c : ticker+n for c , n in names.items()}) for ticker in self.ohlcv]
+        self.data= pd.concat(frames , axis=1) if frames else pd.DataFrame()
+        self.temp_data=self.data.copy()
+        self.fingerprints={}
+
+    def share_data(self) :
+        '''
+        Publish OHLCV arrays of all tickers in shared memory for worker processes (forex_backtest_class(... , shared=descriptors))
+        Returns (descriptors , blocks) , call close() and unlink() of every block when the workers are done.
+        '''
+        descriptors , blocks = {} , []
+        for ticker in self.tickers :
+            descriptors[ticker] , block = be.share_ticker_data(self.ohlcv[ticker])
+            blocks.append(block)
+        return descriptors , blocks
+
+    @pf.profiled()
+    def add_ticker_data(self , ticker , raw) :
+        '''
+        Calculate returns and hold strategy of one ticker and keep its valid bars in self.ohlcv[ticker]
+        raw : DataFrame with Open , High , Low , Close , Volume columns
+        '''
+        df=pd.DataFrame(index=raw.index)
+        for column in ["Open","High","Low","Close","Volume"] :
+            values= raw[column]
+            df[column]= values.iloc[:,0] if isinstance(values , pd.DataFrame) else values # yfinance may return (column , ticker) columns
+        df["returns"] = np.log(df["Close"] / df["Close"].shift(1))
+        df["cum_return"] = np.exp(df["returns"].cumsum())
+        df.dropna(inplace=True)
+        self.ohlcv[ticker]= be.Ticker_Data(ticker , df)
+
+    def cache_key(self , ticker) :
+        '''
+        Key of ticker data in indicator cache : (ticker , fingerprint of its OHLC data and dates)
+        Indicators of reloaded or changed data get a new key , so old series are never reused for them.
+        '''
+        if ticker not in self.fingerprints :
+            self.fingerprints[ticker]= self.ohlcv[ticker].fingerprint()
+        return (ticker , self.fingerprints[ticker])
+
+    def cache_stats(self) :
+        '''
+        Hits , misses , evictions and memory use of indicator cache
+        '''
+        return self.cache.stats()
+
+    def profile_table(self) :
+        '''
+        Calls , time and allocated blocks of every profiled stage (empty unless the class is built with profile=True)
+        '''
+        return self.profiler.table()
+
+    def profile_json(self , path=None) :
+        '''
+        Profiled stages and counters as json (written to path if it is given)
+        '''
+        return self.profiler.to_json(path)
     
+    @pf.profiled()
+    def timeframes(self , ticker , intervals) :
+        '''
+        Bars of the ticker in bigger intervals (for example ["15m","1h","4h","1d"]) built in one pass from its bars
+        and kept in indicator cache , with alignment to the bars of the ticker (see backtest_engine.Timeframe_Bars)
+        Returns dict interval -> Timeframe_Bars
+        '''
+        intervals= [intervals] if isinstance(intervals , str) else list(intervals)
+        key= self.cache_key(ticker)
+        found= {i : self.cache.get((ticker , "timeframe" , i , key[1])) for i in intervals}
+        missing= [i for i in intervals if found[i] is None]
+        if missing :
+            data= self.ohlcv[ticker]
+            index= data.index.tz_localize(None) if data.index.tz is not None else data.index # bins of wall clock time
+            bars= be.aggregate_timeframes(index.as_unit("ns").asi8 , data.open , data.high , data.low , data.close , data.volume , missing)
+            for i in missing :
+                found[i]= bars[i]
+                self.cache.put((ticker , "timeframe" , i , key[1]) , bars[i])
+        return found
+
+    @pf.profiled()
     def rename_columns_df(self,ticker) :
-        df=self.data[[ticker+"_open",ticker+"_low",ticker+"_high",ticker+"_close",ticker+"_returns",ticker+"_cum_return"]].copy()
-        df.rename(columns={ticker+"_open":"Open",ticker+"_low":"Low",ticker+"_high":"High",ticker+"_close":"Close",ticker+"_returns":"returns",ticker+"_cum_return":"cum_return"},inplace=True)
-        return df
+        '''
+        DataFrame of Open , Low , High , Close , returns , cum_return of the ticker (only its own valid bars)
+        '''
+        return self.ohlcv[ticker].to_frame()
 
     def plot_data (self , columns=None) :
         '''
@@ -129,7 +234,8 @@ class forex_backtest_class():
         self.current_balance =round(self.current_balance,2)
         self.units += units
         self.trades +=1
-        print ("{} Buying {} for {} with {} spread. Net price is {} and current balance is {}".format(date,units,round(price1,5),self.spread,round(price,5),self.current_balance))
+        self.ledger.append(bar , self.temp_data.index[bar].value , 1 , units , price1 , price , self.current_balance)
+        self.trade_view.show("{} Buying {} for {} with {} spread. Net price is {} and current balance is {}".format(date,units,round(price1,5),self.spread,round(price,5),self.current_balance))
 
     def go_long (self , bar , units=None , amount=None):
         '''
@@ -165,7 +271,8 @@ class forex_backtest_class():
         self.current_balance =round(self.current_balance,2)
         self.units -= units
         self.trades +=1
-        print ("{} Selling {} for {} with {} spread. Net price is {} and current balance is {}".format(date,units,round(price1,5),self.spread,round(price,5),self.current_balance))
+        self.ledger.append(bar , self.temp_data.index[bar].value , -1 , units , price1 , price , self.current_balance)
+        self.trade_view.show("{} Selling {} for {} with {} spread. Net price is {} and current balance is {}".format(date,units,round(price1,5),self.spread,round(price,5),self.current_balance))
 
     def go_short (self , bar , units=None , amount=None):
         '''
@@ -184,6 +291,7 @@ class forex_backtest_class():
                     amount = self.current_balance
                 self.sell_instrument(bar , amount= amount)
 
+    @pf.profiled()
     def close_position(self,ticker , bar) :
         '''
         bar : in which bar close all the positions
@@ -191,8 +299,9 @@ class forex_backtest_class():
         date , price = self.get_values(bar)
         self.current_balance += self.units * price
         self.current_balance -= abs(self.units) * self.spread/2
+        self.ledger.close(len(self.temp_data) + bar if bar < 0 else bar , self.temp_data.index[bar].value , self.units , price , self.current_balance)
         price1=price
-        price -= self.spread/2
+        price -= self.spread/2 # printed net price of the closing line (the ledger keeps the side aware one)
         self.trades +=1
         print ("{} Closing Position {} for {} with {} spread. Net price is {} and current balance is {}".format(date,self.units,round(price1,5),self.spread,round(price,5),round(self.current_balance,2)))
         
@@ -208,6 +317,7 @@ class forex_backtest_class():
         print("{} | The annual compound growth rate for {} months = {}".format(date,months,round(cagr,4)))
         return round(perf,2), self.trades,self.get_perf_hold(bar) , self.print_current_Balance(bar)
         
+    @pf.profiled("print")
     def print_current_position (self , bar) :
         '''
         bar : Print current position value in this bar
@@ -216,6 +326,7 @@ class forex_backtest_class():
         cpv = self.units * price
         print("{} | Current position value ={}".format(date,round(cpv,2)))
 
+    @pf.profiled("print")
     def print_current_Balance (self , bar):
         '''
         bar : Print current balance value in this bar
@@ -224,6 +335,7 @@ class forex_backtest_class():
         print ("{} | Current Balance : {}".format(date, round(self.current_balance , 2)))
         return round(self.current_balance , 2)
 
+    @pf.profiled("print")
     def print_current_nav(self , bar):
         '''
         bar : Print current net asset in this bar
@@ -232,7 +344,135 @@ class forex_backtest_class():
         nav = self.current_balance + self.units *price
         print("{} | Net Asset Value of = {}".format(date , round(nav,2)))
 
+    def strategy_perf(self , df , column="pos") :
+        '''
+        Calculate "trades" and "cum_str_net" of a strategy from its position column (strategy_api.strategy_result)
+        df     : DataFrame with returns and position (1 , 0 , -1) of each bar
+        column : name of position column
+        The first bar (without strategy return) is dropped , df is kept in temp_data and performance of the last bar is returned.
+        '''
+        return self.keep_strategy(sa.strategy_result("" , "" , () , df , self.spread , column))
+
+    def keep_strategy(self , result) :
+        '''
+        Keep a copy of the frame of a strategy_api.Strategy_Result in temp_data and return its performance
+        '''
+        self.temp_data=result.frame.copy() # later changes of temp_data never change the result
+        return result.perf
+
+    @pf.profiled()
+    def adx_series(self , ticker , check_adx , period=14) :
+        '''
+        ADX Series of ticker for the ADX filter of backtests (None if check_adx is off)
+        '''
+        return self.adx_data(ticker , period)["adx"] if check_adx else None
+
+    def adx_filter(self , ticker , check_adx , df , period=14 , level=25) :
+        '''
+        Bars of df where trading is allowed : ADX over level (all bars if check_adx is off)
+        ADX series of the ticker is computed once (adx_data) and only indexed here.
+        '''
+        return sa.adx_allow(df , self.adx_series(ticker , check_adx , period) , level)
+
+    def run_backtest(self , ticker , df , pos) :
+        '''
+        Trade the position of each bar with backtest_engine.simulate_trades and close all the positions in the last bar
+        df  : DataFrame of the strategy (kept in temp_data)
+        pos : position after each bar (1 , 0 , -1)
+        '''
+        return self.report_backtest(sa.backtest_result("" , ticker , () , df , pos , self.spread , self.initial_amount))
+
+    @pf.profiled()
+    def report_backtest(self , result) :
+        '''
+        Keep copies of the frame and ledger and the state of a strategy_api.Backtest_Result (balance , units , trades , position) and print its summary like close_position
+        Returns (performance , number of trades , performance of buy and hold , balance)
+        '''
+        self.temp_data=result.frame.copy() # copies , buy / sell / close calls never change the result
+        self.ledger=result.ledger.copy()
+        self.current_balance , self.units , self.trades = result.balance , 0 , result.trades
+        self.position = result.pos[-1]
+        with self.profiler.stage("print") :
+            self.print_summary(result)
+        return result.perf , result.trades , result.hold , round(result.balance , 2)
+
+    def print_summary(self , result) :
+        '''
+        Print the closing trade and the summary of a strategy_api.Backtest_Result
+        '''
+        print ("{} Closing Position {} for {} with {} spread. Net price is {} and current balance is {}".format(result.date,result.units,round(result.price,5),result.spread,round(result.price-result.spread/2,5),round(result.balance,2)))
+        print(75 * "-")
+        print("*** Summary of trading : {} ***".format(result.ticker))
+        print("{} | Performance (%) = {}".format(result.date,result.perf))
+        print("{} | Number of Trades = {}".format(result.date,result.trades))
+        print("{} | Performance of Buy and Hold Stategy (%)= {}".format(result.date, result.hold))
+        print("{} | The annual compound growth rate for {} months = {}".format(result.date,result.months,round(result.cagr,4)))
+        print ("{} | Current Balance : {}".format(result.date, round(result.balance , 2)))
+
+    def trades_frame(self) :
+        '''
+        Fills of the last backtest (self.ledger) as DataFrame
+        '''
+        return self.ledger.to_frame(self.temp_data.index.tz)
+
+    @pf.profiled("print")
+    def show_trades(self , every=1 , max_lines=50 , interval=0.0) :
+        '''
+        Print the fills of the last backtest through a rate limited view (see backtest_engine.Trade_View)
+        '''
+        view= be.Trade_View(every , max_lines , interval)
+        for line in self.ledger.lines(self.temp_data.index.tz) :
+            view.show(line)
+        if view.skipped() :
+            print("... {} of {} trades not printed".format(view.skipped() , len(self.ledger)))
+
+    def save_trades(self , path , table="trades" , **tags) :
+        '''
+        Export the fills of the last backtest in bulk : a ".npz" path is saved as columnar numpy file ,
+        other paths are SQLite databases and the rows are appended to table with tags as constant columns (e.g. ticker="ETH-USD")
+        '''
+        if str(path).endswith(".npz") :
+            self.ledger.to_npz(path)
+        else :
+            self.ledger.to_sqlite(path , table , **tags)
+
 #****************************************************************** Calculate KPI of Portfolio *******************************
+    def kpi_series(self , column_name):
+        '''
+        Valid values of a column of self.data (Close or Adj_close of a ticker , or an equity curve)
+        '''
+        if column_name not in self.data.columns:
+            raise ValueError(f"Column '{column_name}' not found in the DataFrame.")
+        series= self.data[column_name].dropna()
+        if len(series) < 2:
+            raise ValueError("The DataFrame must contain at least two data points.")
+        return series
+
+    @pf.profiled()
+    def kpis(self , columns=None , period=365 , risk_free_rate=0.0):
+        '''
+        CAGR , volatility , Sharpe , Sortino , maximum drawdown (with duration) and Calmar of many columns in one pass
+        (see kpi_engine.kpi_table)
+        columns : columns of self.data , default the close of every ticker
+        period  : number of bars in one year (for FOREX daily bars = 252)
+        '''
+        columns= [ticker+"_close" for ticker in self.tickers] if columns is None else list(columns)
+        for column in columns :
+            self.kpi_series(column)
+        return ke.kpi_table(self.data[columns] , period , risk_free_rate=risk_free_rate)
+
+    def kpi(self , column_name , name , period=365 , risk_free_rate=0.0):
+        '''
+        One KPI of one column (a column of kpi_engine.KPI_COLUMNS)
+        '''
+        return ke.kpi_table(self.kpi_series(column_name) , period , risk_free_rate=risk_free_rate)[name].iloc[0]
+
+    def CAGR(self , column_name , period=365):
+        '''
+        Compound annual growth rate of the column , period : number of bars in one year
+        '''
+        return self.kpi(column_name , "cagr" , period)
+
     def volatility(self , column_name, period=365):
         '''
         Calculates the annualized volatility.
@@ -243,31 +483,14 @@ class forex_backtest_class():
             period (int, optional): The number of trading days in the period (for FOREX= 252).
 
         Returns:
-            float: The annualized volatility value.
+            float: The annualized volatility value (standard deviation of log returns).
 
         Raises:
             ValueError: If the column is not found or there are less than two data points.
         '''
-        df= self.data.copy()
-        if column_name not in df.columns:
-            raise ValueError(f"Column '{column_name}' not found in the DataFrame.")
-
-        if len(df) < 2:
-            raise ValueError("The DataFrame must contain at least two data points.")
-
-        # Calculate daily logarithmic returns
-        returns = np.log(df[column_name].pct_change() + 1)
-
-        # Calculate standard deviation of returns
-        std_dev = returns.std()
-
-        # Annualize volatility by multiplying by square root of period
-        annualized_volatility = std_dev * np.sqrt(period)
+        return self.kpi(column_name , "volatility" , period)
 
-        return annualized_volatility
-
-
-    def sharpe_ratio(self, column_name, risk_free_rate=0.0):
+    def sharpe_ratio(self, column_name, risk_free_rate=0.0 , period=365):
         '''
         Calculates the Sharpe Ratio .
         محاسبه نسبت شارپ : میانگین بازده بدست آمده مازاد بر نرخ سود بدون رسیک به ازای هر واحد
@@ -276,16 +499,14 @@ class forex_backtest_class():
         Args:
             column_name (str): The name of the column with Close or Adj_close.
             risk_free_rate (float, optional): The annualized risk-free rate. Defaults to 0.0.
+            period (int, optional): The number of bars in one year.
 
         Returns:
-            float: The Sharpe Ratio value.
+            float: The Sharpe Ratio value , (CAGR - risk_free_rate) / volatility.
         '''
-        df= self.data.copy()
-        sharpe_ratio = (self.CAGR(column_name) - risk_free_rate)/self.volatility(column_name)
-
-        return sharpe_ratio
+        return self.kpi(column_name , "sharpe" , period , risk_free_rate)
 
-    def sortino_ratio(self, column_name, risk_free_rate=0.0):
+    def sortino_ratio(self, column_name, risk_free_rate=0.0 , period=365):
         '''
             Calculates the Sortino Ratio for a DataFrame.
             این نسبت مانند نسبت شارپ است با این تفاوت که در این نسبت فقط ریسک منفی در نظر گرفته می شود
@@ -293,43 +514,16 @@ class forex_backtest_class():
         Args:
             column_name (str): The name of the column with Close or Adj_close.
             risk_free_rate (float, optional): The annualized risk-free rate. Defaults to 0.0.
+            period (int, optional): The number of bars in one year.
 
         Returns:
-            float: The Sortino Ratio value.
+            float: The Sortino Ratio value , (CAGR - risk_free_rate) / annualized deviation of negative log returns
+                   (inf when there is no negative return).
 
         Raises:
             ValueError: If the column is not found or there are less than two data points.
         '''
-        df= self.data.copy()
-        if column_name not in df.columns:
-            raise ValueError(f"Column '{column_name}' not found in the DataFrame.")
-
-        if len(df) < 2:
-            raise ValueError("The DataFrame must contain at least two data points.")
-
-        # Calculate daily logarithmic returns
-        returns = np.log(df[column_name].pct_change() + 1)
-
-        # Calculate downside returns (negative returns only)
-        downside_returns = returns[returns < 0]
-
-        # Calculate squared downside returns
-        squared_downside_returns = downside_returns**2
-
-        # Calculate standard deviation of downside returns (annualized)
-        std_downside_return = np.sqrt(squared_downside_returns.mean()) * np.sqrt(252)  # Assuming daily data
-
-        # Calculate average excess return (same as Sharpe Ratio calculation)
-        avg_excess_return = returns.mean() - risk_free_rate
-
-        # Calculate Sortino Ratio
-        if std_downside_return == 0:
-            # Avoid division by zero (handle case of no downside risk)
-            sortino_ratio = np.inf
-        else:
-            sortino_ratio = avg_excess_return / std_downside_return
-
-        return sortino_ratio
+        return self.kpi(column_name , "sortino" , period , risk_free_rate)
 
     def max_drawdown(self, column_name):
         '''
@@ -340,78 +534,261 @@ class forex_backtest_class():
 
             Returns:
                 tuple: A tuple containing:
-                    - float: The maximum drawdown percentage (negative value).
-                    - int: The index of the row where the maximum drawdown starts.
+                    - float: The maximum drawdown (value / running peak - 1 , negative value).
+                    - The index of the row where the maximum drawdown reaches its bottom.
 
             Raises:
                 ValueError: If the column is not found or there are less than two data points.
         '''
-        df= self.data.copy()
-        if column_name not in df.columns:
-            raise ValueError(f"Column '{column_name}' not found in the DataFrame.")
-
-        if len(df) < 2:
-            raise ValueError("The DataFrame must contain at least two data points.")
-
-        # Calculate cumulative returns (avoiding division by zero)
-        cumulative_returns = (df[column_name].pct_change() + 1).cumprod()
-        # Calculate running maximum
-        rolling_max = cumulative_returns.rolling(window=len(cumulative_returns)).max()
-        # Calculate drawdown
-        drawdown = cumulative_returns - rolling_max
-        # Find the maximum drawdown
-        max_drawdown = drawdown.min()
-        max_drawdown_idx = drawdown.idxmin()
-
-        return max_drawdown, max_drawdown_idx
-
-    def calmar_ratio(self , column_name):
-        "function to calculate calmar ratio"
-        clmr = self.CAGR(column_name)/self.max_drawdown(column_name)
-        return clmr
+        series= self.kpi_series(column_name)
+        stats= ke.drawdown_stats(ke.log_returns(series))
+        return stats["max_drawdown"][0] , series.index[stats["mdd_trough"][0]]
+
+    @pf.profiled()
+    def rolling_kpis(self , column_name , windows , period=365 , risk_free_rate=0.0):
+        '''
+        Rolling volatility , Sharpe , Sortino and drawdown of a column for several windows (bars) , with running drawdown
+        and bars under water , to watch decay of a strategy (see kpi_engine.rolling_kpis)
+        '''
+        return ke.rolling_kpis(self.kpi_series(column_name) , windows , period , risk_free_rate=risk_free_rate)
+
+    def calmar_ratio(self , column_name , period=365):
+        "function to calculate calmar ratio : CAGR / |maximum drawdown|"
+        return self.kpi(column_name , "calmar" , period)
+
+#********************************************************** Parameter Search and Walk Forward *************************
+    strategies= ("sma" , "ema" , "dema" , "rsi" , "macd" , "bollinger" , "stochastic" , "ichimoku")
+
+    def param_space(self , strategy , maxlen , wide=False):
+        '''
+        Ranges of parameters that best_param_* examines for a strategy
+        maxlen : number of bars of the data (short data uses shorter periods)
+        wide   : wider ranges (SMA long up to 500 , RSI period up to 50 , ...) for search_params , too many couples for the full grid
+        Returns tuple of ranges in the order of the strategy arguments
+        '''
+        if wide :
+            return self.wide_space(strategy , maxlen)
+        if strategy in ("sma" , "ema") :
+            if maxlen <= 50 :
+                return (range(5,10,1) , range(10,maxlen,1))
+            elif maxlen >50 and maxlen <200 :
+                return (range(9,50,1) , range(51,maxlen,1))
+            return (range(9,50,1) , range(51,200,1))
+        if strategy == "dema" :
+            if maxlen <= 80 :
+                return (range(10,20,1) , range(20,maxlen,1))
+            return (range(10,40,1) , range(41,80,1))
+        if strategy == "rsi" :
+            return (range(5,20,1) , range(20,40,1) , range(60,min(maxlen,85),1)) # period , ma_down , ma_up
+        if strategy == "macd" :
+            return (range(5,20,1) , range(20,min(maxlen,40),1) , range(5,15,1))
+        if strategy == "bollinger" :
+            return (range(10,min(maxlen,50),1) , range(1,5,1))
+        if strategy == "stochastic" :
+            return (range(11,30,1) , range(2,10,1))
+        if strategy == "ichimoku" :
+            return (range(5,15,1) , range(20,35,1) , range(40,65,1))
+        raise ValueError("Unknown strategy {}".format(strategy))
+
+    def wide_space(self , strategy , maxlen):
+        '''
+        Wide ranges of parameters of a strategy (see param_space)
+        '''
+        if strategy in ("sma" , "ema") :
+            return (range(5,50,1) , range(50,min(maxlen,500),1))
+        if strategy == "dema" :
+            return (range(5,50,1) , range(50,min(maxlen,200),1))
+        if strategy == "rsi" :
+            return (range(5,51,1) , range(15,45,1) , range(55,min(maxlen,95),1))
+        if strategy == "macd" :
+            return (range(5,30,1) , range(30,min(maxlen,100),1) , range(3,25,1))
+        if strategy == "bollinger" :
+            return (range(10,min(maxlen,150),1) , range(1,5,1))
+        if strategy == "stochastic" :
+            return (range(5,min(maxlen,60),1) , range(2,20,1))
+        if strategy == "ichimoku" :
+            return (range(5,30,1) , range(20,min(maxlen,80),1) , range(40,min(maxlen,160),1))
+        raise ValueError("Unknown strategy {}".format(strategy))
+
+    @pf.profiled()
+    def grid_scores(self , ticker , strategy , space , windows=None , rows=None):
+        '''
+        Performance of a strategy for every couple of parameters in space (one dimension per range)
+        windows : optional (first row , end row) windows , each one adds a score in the last dimension
+        rows    : score on the first rows bars only (indicators of the prefix are cached under their own key)
+        '''
+        data= self.ohlcv[ticker]
+        key= self.cache_key(ticker)
+        if rows is not None and rows < len(data) :
+            data= data.head(rows)
+            key= (key[0] , "{}:{}".format(key[1] , rows))
+        self.profiler.count("grid_cells" , len(data) * int(np.prod([len(r) for r in space])))
+        if strategy == "stochastic" :
+            return be.stochastic_grid(data.high , data.low , data.close , data.returns , *space , self.spread , self.cache , key , windows)
+        if strategy == "ichimoku" :
+            return be.ichimoku_grid(data.high , data.low , data.returns , *space , self.spread , self.cache , key , windows)
+        if strategy in self.strategies :
+            grid= getattr(be , strategy+"_grid")
+            return grid(data.close , data.returns , *space , self.spread , self.cache , key , windows)
+        raise ValueError("Unknown strategy {}".format(strategy))
+
+    @pf.profiled()
+    def search_params(self , ticker , strategy , search="coarse" , space=None , wide=False , stride=4 , top_k=3 , eta=3 , min_rows=None , seed=None):
+        '''
+        Best parameters of a strategy from a part of its grid (see param_search.coarse_to_fine) :
+        a strided coarse grid is scored first , then the regions around its top_k points are scored point by point.
+        search   : "coarse" (all candidates on all bars) or "halving" (candidates on growing prefixes of the bars ,
+                   only survivors on all bars)
+        space    : tuple of ranges (default param_space of the strategy , wide=True for the wide ranges)
+        stride   : step of the coarse grid , top_k : number of refined regions
+        eta      : 1/eta of candidates survive a halving rung , min_rows : shortest prefix of halving
+        seed     : seed of the coarse grid (a new one if None) , search with the same seed to repeat a result
+        Returns dict with params , score , seed , options and cost (points scored) , also kept in self.search_info
+        Every best_param_*(ticker , search="grid" , **options) calls it with search and options when search is not "grid"
+        (the default , all couples of param_space) and returns only the params.
+        '''
+        if search not in ("coarse" , "halving") :
+            raise ValueError("Unknown search {}".format(search))
+        bars= len(self.ohlcv[ticker])
+        space= self.param_space(strategy , bars , wide) if space is None else tuple(space)
+        score= lambda sub , rows : self.grid_scores(ticker , strategy , sub , None , rows)
+        info= pm.coarse_to_fine(score , space , bars , stride , top_k , search == "halving" , eta , min_rows , seed)
+        info.update(ticker=ticker , strategy=strategy , search=search)
+        self.profiler.count("search_points" , info["cost"].points)
+        self.search_info= info
+        return info
+
+    def walk_windows(self , ticker , in_sample , out_sample , step=None):
+        '''
+        Rows of walk forward windows as list of (first in sample row , first out of sample row , end row)
+        in_sample , out_sample , step : number of bars (int) or time like "30D" , step is out_sample by default
+        A step that is not positive raises ValueError (the windows would never move).
+        '''
+        step= out_sample if step is None else step
+        index= self.ohlcv[ticker].index
+        n= len(index)
+        windows=[]
+        if isinstance(in_sample , (int , np.integer)) :
+            if step <= 0 :
+                raise ValueError("step of walk forward windows must be positive , got {}".format(step))
+            lo= 0
+            while lo + in_sample < n-1 :
+                windows.append((lo , lo+in_sample , min(lo+in_sample+out_sample , n)))
+                lo += step
+            return windows
+        in_sample , out_sample , step = pd.Timedelta(in_sample) , pd.Timedelta(out_sample) , pd.Timedelta(step)
+        if step <= pd.Timedelta(0) :
+            raise ValueError("step of walk forward windows must be positive , got {}".format(step))
+        t= index[0] if n else None
+        while n :
+            lo , mid , hi = index.searchsorted([t , t+in_sample , t+in_sample+out_sample])
+            if mid >= n-1 :
+                break
+            windows.append((lo , mid , hi))
+            t += step
+        return windows
+
+    @pf.profiled()
+    def walk_forward_rows(self , ticker , windows , strategy):
+        '''
+        Walk forward rows of one strategy for the given windows (see walk_windows) , all windows are scored in one grid pass
+        Returns list of dicts with ticker , window , is_start , is_end , oos_start , oos_end , strategy , params , is_perf , oos_perf , oos_hold
+        '''
+        data= self.ohlcv[ticker]
+        rows= np.array([[(lo , mid) , (mid-1 , hi)] for lo , mid , hi in windows]).reshape(-1 , 2) # in sample , out of sample
+        cum_returns= np.cumsum(data.returns)
+        space= self.param_space(strategy , min(mid - lo for lo , mid , hi in windows))
+        couple=list(product(*space))
+        perf= self.grid_scores(ticker , strategy , space , rows).reshape(len(couple) , -1)
+        perf= np.where(np.isinf(perf) , np.nan , perf)
+        table=[]
+        for w , (lo , mid , hi) in enumerate(windows) :
+            score= np.round(np.nan_to_num(perf[: , 2*w] , nan=-np.inf) , 5)
+            best= int(np.argmax(score)) if len(score) else None
+            table.append({"ticker":ticker , "window":w , "is_start":data.index[lo] , "is_end":data.index[mid-1] ,
+                          "oos_start":data.index[mid] , "oos_end":data.index[hi-1] , "strategy":strategy ,
+                          "params":couple[best] if best is not None else None ,
+                          "is_perf":round(perf[best , 2*w] , 5) if best is not None else np.nan ,
+                          "oos_perf":round(perf[best , 2*w+1] , 5) if best is not None else np.nan ,
+                          "oos_hold":round(np.exp(cum_returns[hi-1] - cum_returns[mid-1]) , 5)}) # buy and hold in out of sample bars
+        return table
+
+    @pf.profiled()
+    def walk_forward(self , ticker , in_sample , out_sample , step=None , strategies=None):
+        '''
+        Walk forward test : for every window the best parameters of the in sample bars are tested on the next out of sample bars.
+        in_sample , out_sample , step : number of bars (int) or time like "30D" , step is out_sample by default
+        strategies : names of strategies (default all)
+        Indicators are computed once on the whole data and every strategy grid is scored for all windows in one pass
+        (backtest_engine.window_kernel). Out of sample returns start from the close of the last in sample bar.
+        Returns tidy DataFrame , one row per (window , strategy) :
+        ticker , window , is_start , is_end , oos_start , oos_end , strategy , params , is_perf , oos_perf , oos_hold
+        '''
+        strategies= self.strategies if strategies is None else strategies
+        windows= self.walk_windows(ticker , in_sample , out_sample , step)
+        columns= ["ticker","window","is_start","is_end","oos_start","oos_end","strategy","params","is_perf","oos_perf","oos_hold"]
+        table=[]
+        if windows :
+            for strategy in strategies :
+                table += self.walk_forward_rows(ticker , windows , strategy)
+        return pd.DataFrame(table , columns=columns)
+
+    @pf.profiled()
+    def walk_forward_study(self , store , in_sample , out_sample , step=None , tickers=None , strategies=None):
+        '''
+        Walk forward of many tickers and strategies saved in a result_store.Result_Store
+        Rows of every (ticker , strategy) are written as soon as they are ready and the (ticker , window , strategy) keys
+        already in the store are skipped , so a stopped study continues where it was.
+        Returns number of new rows
+        '''
+        tickers= self.tickers if tickers is None else tickers
+        strategies= self.strategies if strategies is None else strategies
+        added= 0
+        for ticker in tickers :
+            index= self.ohlcv[ticker].index
+            windows= self.walk_windows(ticker , in_sample , out_sample , step)
+            keys= [store.window_key(index[lo] , index[mid] , index[hi-1]) for lo , mid , hi in windows]
+            for strategy in strategies :
+                done= store.done_keys(ticker , strategy)
+                todo= [w for w , key in enumerate(keys) if (ticker , key , strategy) not in done]
+                if not todo :
+                    continue
+                start= time.perf_counter()
+                rows= self.walk_forward_rows(ticker , [windows[w] for w in todo] , strategy)
+                elapsed= (time.perf_counter() - start) / len(rows)
+                for w , row in zip(todo , rows) :
+                    row["window"]= keys[w]
+                    row["elapsed"]= elapsed
+                store.add(rows)
+                added += len(rows)
+                print("{} | {} | {} windows saved".format(ticker , strategy , len(rows)))
+        return added
 
 #********************************************************** Technical Stategies *************************************
 
     # ***************************************************** Simple Moving Average ***********************************
+    @pf.profiled()
     def sma(self , ticker ,SMA_S ,SMA_L) :
         '''
         Calculate Simple Moving Average Strategy
         '''
-        df=self.rename_columns_df(ticker)
-        df["SMA_S"] = df["Close"].rolling(SMA_S).mean()
-        df["SMA_L"] = df["Close"].rolling(SMA_L).mean()
-        df.dropna(inplace=True)
-        df["pos"]=0
-        df["pos"]= np.where(df.SMA_S>df.SMA_L , 1 , -1) # position of buy (1) or sell (-1)
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_sma"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_sma - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.sma(self.ohlcv[ticker] , SMA_S , SMA_L , self.spread , self.cache , self.cache_key(ticker)))
     
-    def best_param_sma(self , ticker):
+    @pf.profiled()
+    def best_param_sma(self , ticker , search="grid" , **options):
         '''
         It examines the SMA strategy and declares the best short and long time periods with a higher profit target.
-        '''
-        maxlen=len(self.data[ticker+"_close"])
-        if maxlen <= 50 :
-            sma_s = range(5,10,1)
-            sma_l = range(10,maxlen,1)
-        elif maxlen >50 and maxlen <200 :
-            sma_s = range(9,50,1)
-            sma_l = range(51,maxlen,1)
-        else :
-            sma_s = range(9,50,1)
-            sma_l = range(51,200,1)
-        couple=list(product(sma_s,sma_l))
-        results=[]
-        for c in couple :
-            results.append(self.sma(ticker , c[0] , c[1]))
+        Each moving average is computed once and all couples are scored together by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "sma" , search , **options)["params"]
+        space= self.param_space("sma" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "sma" , space).ravel(), 5)
         return couple[np.argmax(results)]
-    
+
+    @pf.profiled()
     def sma_backtest(self, ticker ,SMA_S ,SMA_L , check_adx="False"):
         '''
         Back testing for SMA 
@@ -420,73 +797,32 @@ class forex_backtest_class():
         '''
         print("Testing SMA Strategy | {} | SMA_S= {} | SMA_L= {}".format(ticker , SMA_S,SMA_L))
         print(75 * "-")
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["SMA_S"] = df["Close"].rolling(SMA_S).mean()
-        df["SMA_L"] = df["Close"].rolling(SMA_L).mean()
-        df.dropna(inplace =True)
-        self.temp_data=df.copy()
-        
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-
-            if df["SMA_S"].iloc[bar] > df["SMA_L"].iloc[bar] and adx>25 :
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["SMA_S"].iloc[bar] < df["SMA_L"].iloc[bar] and adx>25 :
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.sma_backtest(self.ohlcv[ticker] , SMA_S , SMA_L , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
 
     # ************************************************* Exponential Moving Average ******************************************
+    @pf.profiled()
     def ema(self , ticker , EMA_S , EMA_L) :
         '''
         Calculate Exponential Moving Average Strategy
         '''
-        df=self.rename_columns_df(ticker)
-        df["EMA_S"] = df["Close"].ewm(span=EMA_S , min_periods= EMA_S).mean()
-        df["EMA_L"] = df["Close"].ewm(span=EMA_L , min_periods= EMA_L).mean()
-        df.dropna(inplace=True)
-        df["pos"]= np.where(df.EMA_S>df.EMA_L,1,-1) # position of buy (1) or sell (-1)
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_sma"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_sma - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.ema(self.ohlcv[ticker] , EMA_S , EMA_L , self.spread , self.cache , self.cache_key(ticker)))
 
-    def best_param_ema(self , ticker):
+    @pf.profiled()
+    def best_param_ema(self , ticker , search="grid" , **options):
         '''
         It examines the EMA strategy and declares the best short and long time periods with a higher profit target.
-        '''
-        maxlen=len(self.data)
-        if maxlen <= 50 :
-            ema_s = range(5,10,1)
-            ema_l = range(10,maxlen,1)
-        elif maxlen >50 and maxlen <200 :
-            ema_s = range(9,50,1)
-            ema_l = range(51,maxlen,1)
-        else :
-            ema_s = range(9,50,1)
-            ema_l = range(51,200,1)
-        couple=list(product(ema_s,ema_l))
-        results=[]
-        for c in couple :
-            results.append(self.ema(ticker , c[0] , c[1]))
+        Each moving average is computed once and all couples are scored together by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "ema" , search , **options)["params"]
+        space= self.param_space("ema" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "ema" , space).ravel(), 5)
         return couple[np.argmax(results)]
 
+    @pf.profiled()
     def ema_backtest(self ,ticker , EMA_S ,EMA_L ,check_adx="False"):
         '''
         Back testing for EMA 
@@ -496,72 +832,32 @@ class forex_backtest_class():
         print("Testing EMA Strategy | {} | EMA_S= {} | EMA_L= {}".format(ticker ,EMA_S,EMA_L))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["EMA_S"] = df["Close"].ewm(span=EMA_S , min_periods= EMA_S).mean()
-        df["EMA_L"] = df["Close"].ewm(span=EMA_L , min_periods= EMA_L).mean()
-        df.dropna(inplace =True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if df["EMA_S"].iloc[bar] > df["EMA_L"].iloc[bar] and adx>25:
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["EMA_S"].iloc[bar] < df["EMA_L"].iloc[bar] and adx>25:
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.ema_backtest(self.ohlcv[ticker] , EMA_S , EMA_L , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
 
     #*************************************************** Double Exponential Moving Average strategy ******************
+    @pf.profiled()
     def dema( self , ticker ,short , long ):
         '''
         Calculate Double Exponential Moving Average Strategy
         '''
-        df=self.rename_columns_df(ticker)
-        df["returns"]= np.log(df.Close.div(df.Close.shift(1)))
-        df.dropna(inplace=True)
-        EMA = df["Close"].ewm(span=short , adjust = False).mean()
-        df["DEMA_S"] = 2*EMA - EMA.ewm(span=short , adjust = False).mean()
-        EMA = df["Close"].ewm(span=long , adjust = False).mean()
-        df["DEMA_L"] = 2*EMA - EMA.ewm(span=short , adjust = False).mean()
-        df["pos"] = np.where(df['DEMA_S'] > df['DEMA_L'] , 1 , -1 )
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_dema"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_dema - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.dema(self.ohlcv[ticker] , short , long , self.spread , self.cache , self.cache_key(ticker)))
     
-    def best_param_dema(self , ticker):
+    @pf.profiled()
+    def best_param_dema(self , ticker , search="grid" , **options):
         '''
         It examines the DEMA strategy and declares the best short and long time periods with a higher profit target.
-        '''
-        maxlen=len(self.data)
-        if maxlen <= 80 :
-            dema_s = range(10,20,1)
-            dema_l = range(20,maxlen,1)
-        else :
-            dema_s = range(10,40,1)
-            dema_l = range(41,80,1)
-        couple=list(product(dema_s,dema_l))
-        results=[]
-        for c in couple :
-            results.append(self.dema(ticker ,c[0],c[1]))
+        Each moving average is computed once and all couples are scored together by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "dema" , search , **options)["params"]
+        space= self.param_space("dema" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "dema" , space).ravel(), 5)
         return couple[np.argmax(results)]
 
+    @pf.profiled()
     def dema_backtest(self ,ticker , short ,long ,check_adx="False"):
         '''
         Back testing for DEMA 
@@ -571,91 +867,34 @@ class forex_backtest_class():
         print("Testing DEMA Strategy | {} | Short= {} | Long= {}".format(ticker ,short,long))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["returns"]= np.log(df.Close.div(df.Close.shift(1)))
-        df.dropna(inplace=True)
-        EMA = df["Close"].ewm(span=short , adjust = False).mean()
-        df["DEMA_S"] = 2*EMA - EMA.ewm(span=short , adjust = False).mean()
-        EMA = df["Close"].ewm(span=long , adjust = False).mean()
-        df["DEMA_L"] = 2*EMA - EMA.ewm(span=short , adjust = False).mean()
-        df["pos"] = np.where(df['DEMA_S'] > df['DEMA_L'] , 1 , -1 )
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_dema"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_dema - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if df["DEMA_S"].iloc[bar] > df["DEMA_L"].iloc[bar] and adx>25:
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["DEMA_S"].iloc[bar] < df["DEMA_L"].iloc[bar] and adx>25:
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.dema_backtest(self.ohlcv[ticker] , short , long , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
     # ****************************************** Relative Strength Index Indicator ******************************
+    @pf.profiled()
     def rsi(self , ticker ,period=14 ,ma_down=30 , ma_up=70 ):
         '''
         Calculate Relative Strength Index
         '''
-        df=self.rename_columns_df(ticker)
-        df["returns"]= np.log(df.Close.div(df.Close.shift(1)))
-        df.dropna(inplace=True)
-        df["UP"]= np.where( df.Close.diff() > 0 , df.Close.diff() , 0) # Height of Green candle (diffrence between last price and before)
-        df["DOWN"] = np.where( df.Close.diff() < 0 , -df.Close.diff() , 0) # Height of Red candle
-        df["MA_UP"]= df.UP.rolling(int(period)).mean()
-        df["MA_DOWN"]= df.DOWN.rolling(int(period)).mean()
-        df["RSI"]= df.MA_UP / (df.MA_UP + df.MA_DOWN) *100
-        df.dropna(inplace=True)
-        rsi_up= int(ma_up)
-        rsi_down= int(ma_down)
-        df["pos"]= np.where( df.RSI > rsi_up , -1 , np.nan) # Sell warning
-        df["pos"]= np.where( df.RSI < rsi_down , 1 , df.pos) # Buy warning
-        df.pos = df.pos.fillna(0)
-        df.dropna(inplace=True)
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_rsi"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_rsi - (df.trades * (self.spread/2))
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.rsi(self.ohlcv[ticker] , period , ma_down , ma_up , self.spread , self.cache , self.cache_key(ticker)))
 
-    def best_param_rsi(self , ticker):
+    @pf.profiled()
+    def best_param_rsi(self , ticker , search="grid" , **options):
         '''
         It examines the RSI strategy and declares the best period and up and down moving average with a higher profit target.
-        '''
-        maxlen=len(self.data)
-        if maxlen <= 85 :
-            ma_down = range(20,40,1)
-            ma_up   = range(60,maxlen,1)
-        else :
-            ma_down = range(20,40,1)
-            ma_up   = range(60,85,1)
-        period = range(5,20,1)
-        couple=list(product(period,ma_down,ma_up))
-        results=[]
-        for c in couple :
-            results.append(self.rsi(ticker ,c[0],c[1],c[2]))
+        RSI is computed once per period and reused for all (ma_down , ma_up) couples by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "rsi" , search , **options)["params"]
+        space= self.param_space("rsi" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "rsi" , space).ravel(), 5)
         if (len(results)) :
             return couple[np.argmax(results)]
         else : 
             return "There is no position to trade !"
-        
+
+    @pf.profiled()
     def rsi_backtest(self , ticker ,period ,ma_down , ma_up ,check_adx="False"):
         '''
         Back testing for RSI 
@@ -666,80 +905,35 @@ class forex_backtest_class():
         print("Testing RSI Strategy | {} | Period= {} | MA_Down= {} | MA_Up= {}".format(self.symbol ,period,ma_down,ma_up))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        df=self.rename_columns_df(ticker)
-        df["returns"]= np.log(df.Close.div(df.Close.shift(1)))
-        df.dropna(inplace=True)
-        df["UP"]= np.where( df.Close.diff() > 0 , df.Close.diff() , 0) # Height of Green candle (diffrence between last price and before)
-        df["DOWN"] = np.where( df.Close.diff() < 0 , - df.Close.diff() , 0) # Height of Red candle
-        df["MA_UP"]= df.UP.rolling(int(period)).mean()
-        df["MA_DOWN"]= df.DOWN.rolling(int(period)).mean()
-        df["RSI"]= df.MA_UP / (df.MA_UP + df.MA_DOWN) *100
-        df.dropna(inplace=True)
-        rsi_up= int(ma_up)
-        rsi_down= int(ma_down)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if df["RSI"].iloc[bar] < rsi_down :
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["RSI"].iloc[bar] > rsi_up :
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.rsi_backtest(self.ohlcv[ticker] , period , ma_down , ma_up , self.spread , self.initial_amount , None , self.cache , self.cache_key(ticker)))
 
     #*************************************************************************
+    @pf.profiled()
     def macd (self , ticker ,EMA_S , EMA_L , Signal):
         '''
         Calculate Moving average convergence/divergence Strategy
         '''
-        df=self.rename_columns_df(ticker)
-        df["EMA_S"] = df["Close"].ewm(span=EMA_S , min_periods= EMA_S).mean()
-        df["EMA_L"] = df["Close"].ewm(span=EMA_L , min_periods= EMA_L).mean()
-        df["MACD"]= df["EMA_S"] - df["EMA_L"]
-        df["MACD_Signal"] = df.MACD.ewm(span=Signal , min_periods=Signal).mean()
-        df.dropna( inplace=True)
-        df["pos"]= np.where(df.MACD - df.MACD_Signal > 0 , 1, -1) # position of buy (1) or sell (-1)
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_macd"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_macd - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.macd(self.ohlcv[ticker] , EMA_S , EMA_L , Signal , self.spread , self.cache , self.cache_key(ticker)))
 
-    def best_param_macd(self , ticker):
+    @pf.profiled()
+    def best_param_macd(self , ticker , search="grid" , **options):
         '''
         It examines the MACD strategy and declares the best short and long and signal time periods with a higher profit target.
-        '''
-        maxlen=len(self.data)
-        if maxlen <= 40 :
-            ema_s = range(5,20,1)
-            ema_l = range(20,maxlen,1)
-        else :
-            ema_s = range(5,20,1)
-            ema_l = range(20,40,1)
-        signal = range(5,15,1)
-        couple=list(product(ema_s,ema_l,signal))
-        results=[]
-        for c in couple :
-            results.append(self.macd(ticker ,c[0],c[1],c[2]))
+        Each moving average is computed once and all couples are scored together by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "macd" , search , **options)["params"]
+        space= self.param_space("macd" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "macd" , space).ravel(), 5)
         if (len(results)) :
             return couple[np.argmax(results)]
         else : 
             return "There is no position to trade !"
 
+    @pf.profiled()
     def macd_backtest(self ,ticker , EMA_S ,EMA_L , Signal ,check_adx="False"):
         '''
         Back testing for MACD 
@@ -750,36 +944,11 @@ class forex_backtest_class():
         print("Testing MACD Strategy | {} | EMA_S= {} | EMA_L= {} | Signal= {}".format(self.symbol ,EMA_S,EMA_L,Signal))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["EMA_S"] = df["Close"].ewm(span=EMA_S , min_periods= EMA_S).mean()
-        df["EMA_L"] = df["Close"].ewm(span=EMA_L , min_periods= EMA_L).mean()
-        df["MACD"]= df["EMA_S"] - df["EMA_L"]
-        df["MACD_Signal"] = df.MACD.ewm(span=Signal , min_periods=Signal).mean()
-        df.dropna( inplace=True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if df["MACD"].iloc[bar] - df["MACD_Signal"].iloc[bar] > 0 and adx>25 :
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["MACD"].iloc[bar] - df["MACD_Signal"].iloc[bar] < 0 and adx>25 :
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.macd_backtest(self.ohlcv[ticker] , EMA_S , EMA_L , Signal , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
 
     #************************************************************************* Bollinger Band Indicator **************************
+    @pf.profiled()
     def bollinger (self , ticker ,sma , dev ) :
         '''
         Calculate Bollinger Band Indicator
@@ -789,42 +958,23 @@ class forex_backtest_class():
         '''
         self.position=0
         self.trades=0
-        df=self.rename_columns_df(ticker)
-        # می توان بجای قیمت بسته شدن میانگین قیمت بالا و پایین و بسته شدن را هم گذاشت.
-        df["sma"]=df.Close.rolling(sma).mean()
-        df["lower"]= df["sma"] - dev * df["Close"].rolling(sma).std()
-        df["upper"]= df["sma"] + dev * df["Close"].rolling(sma).std()
-        df.dropna(inplace=True)
-        df["position"]=np.where (df.Close < df.lower ,1 , np.nan)
-        df["position"]=np.where (df.Close > df.upper ,-1 , df["position"])
-        df["distance"]= df.Close - df.sma
-        df["position"]= np.where( df.distance * df.distance.shift(1) <0 , 0, df["position"])
-        df["position"]= df.position.ffill().fillna(0)
-        df["trades"]= df.position.diff().fillna(0).abs()
-        df["str_boll"]= df.position.shift(1)* df.returns
-        df["str_net"]= df.str_boll - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.bollinger(self.ohlcv[ticker] , sma , dev , self.spread , self.cache , self.cache_key(ticker)))
     
-    def best_param_bollinger(self ,ticker):
+    @pf.profiled()
+    def best_param_bollinger(self , ticker , search="grid" , **options):
         '''
         It examines the Bollinger Band strategy and declares the best SMA and Deviation with a higher profit target.
-        '''
-        maxlen=len(self.data)
-        if maxlen <= 50 :
-            sma = range(10,maxlen,1)
-        else :
-            sma = range(10,50,1)
-        dev = range(1,5,1)
-        couple=list(product(sma,dev))
-        results=[]
-        for c in couple :
-            results.append(self.bollinger(ticker ,c[0],c[1]))
+        Couples are scored with the same enter / exit / flip logic that bollinger_backtest trades (see backtest_engine.bollinger_grid).
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "bollinger" , search , **options)["params"]
+        space= self.param_space("bollinger" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "bollinger" , space).ravel(), 5)
         return couple[np.argmax(results)]
-        
+
+    @pf.profiled()
     def bollinger_backtest (self, ticker ,SMA , dev ,check_adx="False"): # ************** شروط معامله دوباره کنترل شود. مشکل دارد خرید با مقدار منفی انجام می دهد
         '''
         Back Testing for Bollinger bands strategy
@@ -832,89 +982,34 @@ class forex_backtest_class():
         print("Testing Bollinger Band Strategy | {} | SMA= {} | dev= {}".format(self.symbol , SMA,dev))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
-        self.current_balance=self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["SMA"] = df.Close.rolling(SMA).mean()
-        df["Lower"] = df["SMA"]- df.Close.rolling(SMA).std() * dev
-        df["Upper"] = df["SMA"]+ df.Close.rolling(SMA).std() * dev
-        df.dropna(inplace = True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if self.position ==0 :
-                if df["Close"].iloc[bar] < df["Lower"].iloc[bar] and adx>25:
-                    self.go_long (bar , amount="all")
-                    self.position = 1
-                elif df["Close"].iloc[bar] > df["Upper"].iloc[bar] and adx>25:
-                    self.go_short (bar , amount="all")
-                    self.position = -1
-            
-            elif self.position ==1 :
-                if df["Close"].iloc[bar] > df["SMA"].iloc[bar] and adx>25:
-                    if df["Close"].iloc[bar] > df["Upper"].iloc[bar]:
-                        self.go_short (bar , amount="all")
-                        self.position = -1
-                    else :
-                        self.go_short(bar , units= self.units)
-                        self.position=0
-            
-            elif self.position == -1 :            
-                if df["Close"].iloc[bar] < df["SMA"].iloc[bar] and adx>25 :
-                    if df["Close"].iloc[bar] < df["Lower"].iloc[bar]:
-                        self.go_long (bar , amount="all")
-                        self.position = 1
-                    else :
-                        self.go_long(bar , units= -self.units)
-                        self.position=0
-        
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.bollinger_backtest(self.ohlcv[ticker] , SMA , dev , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
 
     #*********************************************************** Stochastic Oscilator ******************************************        
+    @pf.profiled()
     def stochastic(self ,ticker , K ,D ) :
         '''
         Calculate Stochastic Oscilator
         '''
-        
-        df=self.rename_columns_df(ticker)
-        df["roll_low"]= df.Low.rolling(int(K)).min()
-        df["roll_high"] = df.High.rolling(int(K)).max() 
-        df["K"]= (df.Close - df.roll_low) / (df.roll_high - df.roll_low) * 100
-        df["D"]= df.K.rolling(int(D)).mean()
-        df["pos"]= np.where( df["K"] > df["D"] , 1 , -1) 
-        df.dropna(inplace=True)
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_stochastic"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_stochastic - (df.trades * (self.spread/2))
-        df.dropna(inplace=True)
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        self.temp_data=df.copy()
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return perf
+        return self.keep_strategy(sa.stochastic(self.ohlcv[ticker] , K , D , self.spread , self.cache , self.cache_key(ticker)))
     
-    def best_param_stochastic(self ,ticker):
+    @pf.profiled()
+    def best_param_stochastic(self , ticker , search="grid" , **options):
         '''
         It examines the Stochastic strategy and declares the best K and D with a higher profit target.
-        '''
-        k = range(11,30,1)
-        d = range(2,10,1)
-
-        couple=list(product(k,d))
-        results=[]
-        for c in couple :
-            results.append(self.stochastic(ticker,c[0],c[1]))
+        Rolling low and high of all K windows are computed once by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "stochastic" , search , **options)["params"]
+        space= self.param_space("stochastic" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "stochastic" , space).ravel(), 5)
         if (len(results)) :
             return couple[np.argmax(results)]
         else : 
             return "There is no position to trade !"
-        
+
+    @pf.profiled()
     def stochastic_backtest(self ,ticker , K, D ,check_adx="False"):
         '''
         Back testing for Stochastic
@@ -924,91 +1019,52 @@ class forex_backtest_class():
         print("Testing Stochastic Strategy | {} | K= {} | D= {} ".format(ticker ,K,D))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        df["roll_low"]= df.Low.rolling(int(K)).min()
-        df["roll_high"] = df.High.rolling(int(K)).max() 
-        df["K"]= (df.Close - df.roll_low) / (df.roll_high - df.roll_low) * 100
-        df["D"]= df.K.rolling(int(D)).mean()
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if check_adx :
-                adx= self.adx(bar=bar)
-            else :
-                adx=26 # Always under 25
-            if df["K"].iloc[bar] > df["D"].iloc[bar] and adx>25 :
-                if self.position in [0,-1] :
-                    self.go_long(bar , amount="all")
-                    self.position =1
-            if df["K"].iloc[bar] < df["D"].iloc[bar] and adx>25 :
-                if self.position in [0,1] :
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.stochastic_backtest(self.ohlcv[ticker] , K , D , self.spread , self.initial_amount , self.adx_series(ticker , check_adx) , self.cache , self.cache_key(ticker)))
     
-    def ichimoku (self , ticker) :
-
-        df=self.rename_columns_df(ticker)
-        ich=ta.trend.IchimokuIndicator(df["High"],df["Low"],9,26,52,False,True)
-        df["span_a"]=ich.ichimoku_a()
-        df["span_b"]=ich.ichimoku_b()
-        df["kijunsen"]=ich.ichimoku_base_line()
-        df["tenkensen"]=ich.ichimoku_conversion_line()
-        df["pos1"]= np.where(df["tenkensen"]>df["kijunsen"],1,-1) # position of buy (1) or sell (-1)
-        df["pos2"]= np.where(df["span_a"]>df["span_b"],1,-1) # position of buy (1) or sell (-1)
-        df["pos"]=(df["pos1"]+df["pos2"])/2
-        df["trades"]= df.pos.diff().fillna(0).abs()
-        df["str_ichi"]= df.pos.shift(1)* df.returns
-        df["str_net"]= df.str_ichi - (df.trades * (self.spread/2))
-        df["cum_str_net"] = df.str_net.cumsum().apply(np.exp)
-        df.dropna(inplace=True)
-        perf = round(df["cum_str_net"].iloc[-1] , 5)
-        return df,perf
-    
-    def ichimoku_backtest(self , ticker) :
-        print("Testing Ichimuko Strategy | {} | s= {} | m= {} | l={}".format(ticker ,14,26,52))
+    @pf.profiled()
+    def ichimoku (self , ticker , tenkan=9 , kijun=26 , senkou=52) :
+        '''
+        Calculate Ichimoku Strategy
+        tenkan : period of conversion line (Tenkan-sen)
+        kijun  : period of base line (Kijun-sen)
+        senkou : period of leading span B (Senkou Span B)
+        '''
+        result=sa.ichimoku(self.ohlcv[ticker] , tenkan , kijun , senkou , self.spread , self.cache , self.cache_key(ticker))
+        return result.frame , self.keep_strategy(result)
+
+    @pf.profiled()
+    def best_param_ichimoku(self , ticker , search="grid" , **options):
+        '''
+        It examines the Ichimoku strategy and declares the best Tenkan , Kijun and Senkou periods with a higher profit target.
+        Highest high and lowest low of all periods are computed once by backtest_engine.
+        search : "grid" (all couples) or a mode of search_params
+        '''
+        if search != "grid" :
+            return self.search_params(ticker , "ichimoku" , search , **options)["params"]
+        space= self.param_space("ichimoku" , len(self.ohlcv[ticker]))
+        couple=list(product(*space))
+        results= np.round(self.grid_scores(ticker , "ichimoku" , space).ravel(), 5)
+        if (len(results)) :
+            return couple[np.argmax(results)]
+        else : 
+            return "There is no position to trade !"
+
+    @pf.profiled()
+    def ichimoku_backtest(self , ticker , tenkan=9 , kijun=26 , senkou=52) :
+        '''
+        Back testing for Ichimoku
+        tenkan : period of conversion line (Tenkan-sen)
+        kijun  : period of base line (Kijun-sen)
+        senkou : period of leading span B (Senkou Span B)
+        '''
+        print("Testing Ichimuko Strategy | {} | s= {} | m= {} | l={}".format(ticker ,tenkan,kijun,senkou))
         print(75 * "-")
 
-        self.position=0
-        self.trades=0
         print ("Initial amount is : {}".format(self.initial_amount))
-        self.current_balance = self.initial_amount
-        
-        df=self.rename_columns_df(ticker)
-        ich=ta.trend.IchimokuIndicator(df["High"],df["Low"],9,26,52,False,True)
-        df["span_a"]=ich.ichimoku_a()
-        df["span_b"]=ich.ichimoku_b()
-        df["kijunsen"]=ich.ichimoku_base_line()
-        df["tenkensen"]=ich.ichimoku_conversion_line()
-        df.dropna(inplace=True)
-        self.temp_data=df.copy()
-
-        for bar in range(len(df)-1) :
-            if self.position in [0] :
-                if df["tenkensen"].iloc[bar] > df["kijunsen"].iloc[bar] and df["span_a"].iloc[bar] > df["span_b"].iloc[bar]:
-                    self.go_long(bar , amount="all")
-                    self.position =1
-                if df["tenkensen"].iloc[bar] < df["kijunsen"].iloc[bar] and df["span_a"].iloc[bar] < df["span_b"].iloc[bar]:
-                    self.go_short(bar , amount="all")
-                    self.position = -1
-            elif self.position in [1] :
-                if df["tenkensen"].iloc[bar] < df["kijunsen"].iloc[bar] :
-                    self.go_short(bar , amount="all")
-                    self.position = 0
-            elif self.position in [-1] :
-                if df["tenkensen"].iloc[bar] > df["kijunsen"].iloc[bar] :
-                    self.go_long(bar , amount="all")
-                    self.position = 0
-        summary= self.close_position(ticker ,bar+1)
-        return summary
+        return self.report_backtest(sa.ichimoku_backtest(self.ohlcv[ticker] , tenkan , kijun , senkou , self.spread , self.initial_amount , None , self.cache , self.cache_key(ticker)))
     #************************************************************ Average True Range Indicator ************************
+    @pf.profiled()
     def atr(self, ticker=None , period=14 , plot=False):
         '''
         Calculate ATR Indicator 
@@ -1019,80 +1075,55 @@ class forex_backtest_class():
             df=self.rename_columns_df(ticker)
         else :
             df=self.temp_data
-        df["H-L"]= abs(df["High"] - df["Low"])
-        df["H-PC"] = abs(df["High"] - df["Close"].shift(1))  # High - Previous Close
-        df["L-PC"]= abs(df["Low"] - df["Close"].shift(1))    # Low - Previous Close
-        df["TR"]= df[["H-L" , "H-PC" , "L-PC"]].max(axis=1 , skipna=False)
+        df["TR"]= be.true_range(df["High"] , df["Low"] , df["Close"])
         df["ATR"]= df["TR"].rolling(period).mean()
-        df.drop(["H-L","H-PC","L-PC"] , axis=1 , inplace=True)
         if plot:
             df[["Close","ATR"]].plot(figsize=(12,8) ,secondary_y="ATR")
         return df
     
     #********************************************** Average Directional Movement Index (ADX) indicator ******************** 
+    @pf.profiled()
+    def adx_data(self , ticker , period=14):
+        '''
+        +DI , -DI and ADX of all bars of a ticker , computed once per (ticker , period) and kept in indicator cache
+        period : one period or a list of periods (for ADX filter sweeps)
+        Returns DataFrame with columns plus_di , minus_di , adx (one period) or
+        columns (plus_di , p) , (minus_di , p) , (adx , p) for a list of periods
+        '''
+        periods = [period] if np.isscalar(period) else list(period)
+        key = self.cache_key(ticker)
+        found = {p : self.cache.get((ticker , "adx" , p , key[1])) for p in periods}
+        missing = [p for p in periods if found[p] is None]
+        if missing :
+            df=self.rename_columns_df(ticker)
+            plus_di , minus_di , adx = be.adx_bank(df["High"] , df["Low"] , df["Close"] , missing)
+            for j , p in enumerate(missing) :
+                found[p] = pd.DataFrame({"plus_di":plus_di[:,j] , "minus_di":minus_di[:,j] , "adx":adx[:,j]} , index=df.index)
+                self.cache.put((ticker , "adx" , p , key[1]) , found[p])
+        if np.isscalar(period) :
+            return found[period]
+        return pd.concat({p : found[p] for p in periods} , axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+    @pf.profiled()
     def adx(self , ticker=None ,period=14 , plot=False , bar=-1 ):
         '''
         Calculates the Average Directional Movement Index (ADX) indicator
         period (int, optional): The lookback period for the calculations. Defaults to 14.
         این اندیکاتور برای تعیین وضعیت حالت دارای روند و بدون روند استفاده می شود. اگر شاخص کمتر از 25 بود ارزش ورود به معامله را ندارد.
+        With ticker the whole series comes from adx_data (computed once) , without it temp_data is used.
         Returns:
-        pandas.DataFrame: The DataFrame with additional columns named:
-            - 'plus_di': Positive Directional Indicator (DI+) values.
-            - 'minus_di': Negative Directional Indicator (DI-) values.
-            - 'adx': Average Directional Movement Index (ADX) values.
+        ADX of the bar , rounded to 2 digits
         '''
         if ticker :
-            df = self.atr(ticker=ticker,period=period)
+            df = self.rename_columns_df(ticker)
+            ind = self.adx_data(ticker , period)
+            df["DIplusN"] , df["DIminusN"] , df["ADX"] = ind["plus_di"] , ind["minus_di"] , ind["adx"]
         else :
-            df = self.atr(period=period)
-        df['DMplus']=np.where((df['High']-df['High'].shift(1))>(df['Low'].shift(1)-df['Low']),df['High']-df['High'].shift(1),0)
-        df['DMplus']=np.where(df['DMplus']<0,0,df['DMplus'])    
-        df['DMminus']=np.where((df['Low'].shift(1)-df['Low'])>(df['High']-df['High'].shift(1)),df['Low'].shift(1)-df['Low'],0)
-        df['DMminus']=np.where(df['DMminus']<0,0,df['DMminus'])
-
-        TRn = []
-        DMplusN = []
-        DMminusN = []
-        TR = df['TR'].tolist()
-        DMplus = df['DMplus'].tolist()
-        DMminus = df['DMminus'].tolist()
-    
-        for i in range(len(df)):
-            if i < period:
-                TRn.append(np.NaN)
-                DMplusN.append(np.NaN)
-                DMminusN.append(np.NaN)
-            elif i == period:
-                TRn.append(df['TR'].rolling(period).sum().tolist()[period])
-                DMplusN.append(df['DMplus'].rolling(period).sum().tolist()[period])
-                DMminusN.append(df['DMminus'].rolling(period).sum().tolist()[period])
-            elif i > period:
-                TRn.append(TRn[i-1] - (TRn[i-1]/14) + TR[i])
-                DMplusN.append(DMplusN[i-1] - (DMplusN[i-1]/period) + DMplus[i])
-                DMminusN.append(DMminusN[i-1] - (DMminusN[i-1]/period) + DMminus[i])
-    
-        df['TRn'] = np.array(TRn)
-        df['DMplusN'] = np.array(DMplusN)
-        df['DMminusN'] = np.array(DMminusN)
-        df['DIplusN']=100*(df['DMplusN']/df['TRn'])
-        df['DIminusN']=100*(df['DMminusN']/df['TRn'])
-        df['DIdiff']=abs(df['DIplusN']-df['DIminusN'])
-        df['DIsum']=df['DIplusN']+df['DIminusN']
-        df['DX']=100*(df['DIdiff']/df['DIsum'])
-    
-        ADX = []
-        DX = df['DX'].tolist()
-    
-        for j in range(len(df)):
-            if j < 2* period-1:
-                ADX.append(np.NaN)
-            elif j == 2* period-1:
-                ADX.append(df['DX'][j- period+1:j+1].mean())
-            elif j > 2*period-1:
-                ADX.append(((period-1)*ADX[j-1] + DX[j])/period)
-    
-        df['ADX']=np.array(ADX)
+            df = self.temp_data
+            plus_di , minus_di , adx = be.adx_bank(df["High"] , df["Low"] , df["Close"] , [period])
+            df["DIplusN"] , df["DIminusN"] , df["ADX"] = plus_di[:,0] , minus_di[:,0] , adx[:,0]
         if plot :
+            plt= pyplot()
             plt.figure(figsize=(16,8))
             p1 = plt.subplot2grid((11,1), (0,0), rowspan = 5, colspan = 1)
             p2 = plt.subplot2grid((11,1), (6,0), rowspan = 5, colspan = 1)
@@ -1106,17 +1137,16 @@ class forex_backtest_class():
             p2.set_title('ADX Indicator')
             plt.show()
 
-        df.drop(["TR","DMplus","DMminus","TRn" ,"DMplusN","DMminusN","DIdiff","DIsum","DX"] , axis=1 , inplace=True)
         return round(df.iloc[bar]["ADX"],2)
     #********************************************************** On Balance Volume Indicator **************************
+    @pf.profiled()
     def obv(self ,ticker):
         '''
         Calculate On Balance Volume Indicator
         این اندیکاتور از نوع مومنتوم بوده و با بررسی حجم معاملات سیگنال می دهد
         اگر بین خط این اندیکاتور و خط قیمت واگرایی وجود داشت یعنی بازار دارد برعکس می شود.
         '''
-        df=self.data[[ticker+"_volume",ticker+"_close",ticker+"_returns"]].copy()
-        df.rename(columns={ticker+"_volume":"Volume",ticker+"_close":"Close",ticker+"_returns":"returns"},inplace=True)
+        df=self.ohlcv[ticker].to_frame(["Volume","Close","returns"])
 
         df['direction'] = np.where(df['returns']>0 , 1 , -1)
         df.loc[0, "direction"] = 0
@@ -0,0 +1,492 @@
+'''
+Online (streaming) indicators for live trading.
+Every indicator keeps a small state and is updated in O(1) when a new bar closes , instead of downloading
+and recomputing the whole history every cycle. The updates repeat the float operations of the batch versions
+(pandas rolling / ewm and the backtest_engine banks used by forex_backtest_class) step by step ,
+so the value after each bar is identical to the batch value of the same bar.
+Bars are dicts (or Series) with the columns of Ticker_Data : Open , High , Low , Close , Volume.
+'''
+from collections import deque
+import math
+import numpy as np
+
+_RESUM = 1e3 * np.finfo(np.float64).eps # Rolling_Std sums the window again when a removal leaves less than this part of the squares
+
+def _div(a, b):
+    '''
+    a / b like NumPy float division (inf or NaN instead of ZeroDivisionError)
+    '''
+    if b == 0 :
+        if a == 0 or a != a :
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+#******************************************************* Rolling Windows *********************************************
+class Rolling_Mean(object):
+    '''
+    Series.rolling(window , min_periods).mean() one value at a time (same compensated add / remove steps as pandas)
+    NaN values are kept in the window but not counted , inf is read as NaN like pandas.
+    '''
+    def __repr__(self):
+        return "Rolling Mean (window={} , value={})".format(self.window, self.value)
+
+    def __init__(self, window, min_periods=None):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.values = deque()
+        self.nobs = self.neg_ct = self.same = 0
+        self.sum_x = self.comp_add = self.comp_remove = 0.0
+        self.prev = math.nan
+        self.value = math.nan
+
+    def _add(self, val):
+        if val != val :
+            return
+        self.nobs += 1
+        y = val - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0 :
+            self.neg_ct += 1
+        self.same = self.same + 1 if val == self.prev else 1
+        self.prev = val
+
+    def _remove(self, val):
+        if val != val :
+            return
+        self.nobs -= 1
+        y = -val - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0 :
+            self.neg_ct -= 1
+
+    def update(self, x):
+        x = float(x)
+        if math.isinf(x) :
+            x = math.nan
+        if not self.values or self.window <= 1 : # new window : start again like pandas
+            self.values.clear()
+            self.nobs = self.neg_ct = self.same = 0
+            self.sum_x = self.comp_add = self.comp_remove = 0.0
+            self.prev = x
+        elif len(self.values) == self.window :
+            self._remove(self.values.popleft())
+        self.values.append(x)
+        self._add(x)
+        if self.nobs >= self.min_periods and self.nobs > 0 :
+            result = self.sum_x / self.nobs
+            if self.same >= self.nobs :
+                result = self.prev
+            elif self.neg_ct == 0 and result < 0 :
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0 :
+                result = 0.0
+        else :
+            result = math.nan
+        self.value = result
+        return result
+
+class Rolling_Std(object):
+    '''
+    Series.rolling(window).std(ddof) one value at a time (same Welford add / remove steps as pandas 3).
+    Like pandas , the window is summed again when a removal cancels almost all of the squared deviations
+    (only then an update costs O(window)).
+    '''
+    def __repr__(self):
+        return "Rolling Std (window={} , value={})".format(self.window, self.value)
+
+    def __init__(self, window, min_periods=None, ddof=1):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.ddof = ddof
+        self.values = deque()
+        self.nobs = 0
+        self.mean_x = self.ssqdm_x = self.comp_add = self.comp_remove = 0.0
+        self.value = math.nan
+
+    def _restart(self):
+        self.nobs = 0
+        self.mean_x = self.ssqdm_x = self.comp_add = self.comp_remove = 0.0
+
+    def _add(self, val):
+        if val != val :
+            return
+        self.nobs += 1
+        prev_mean = self.mean_x - self.comp_add
+        y = val - self.comp_add
+        t = y - self.mean_x
+        self.comp_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val):
+        if val != val :
+            return
+        self.nobs -= 1
+        if self.nobs :
+            prev_mean = self.mean_x - self.comp_remove
+            y = val - self.comp_remove
+            t = y - self.mean_x
+            self.comp_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+        else :
+            self.mean_x = self.ssqdm_x = 0.0
+
+    def update(self, x):
+        x = float(x)
+        if math.isinf(x) :
+            x = math.nan
+        if not self.values or self.window <= 1 :
+            self.values.clear()
+            self._restart()
+        elif len(self.values) == self.window :
+            before = self.ssqdm_x
+            self._remove(self.values.popleft())
+            if self.ssqdm_x <= _RESUM * before : # lost precision , sum the rest of the window again
+                self._restart()
+                for val in self.values :
+                    self._add(val)
+        self.values.append(x)
+        self._add(x)
+        if self.nobs >= self.min_periods and self.nobs > self.ddof :
+            var = 0.0 if self.nobs == 1 else self.ssqdm_x / (self.nobs - self.ddof)
+            result = math.sqrt(var) if var >= 0 else 0.0
+        else :
+            result = math.nan
+        self.value = result
+        return result
+
+class Rolling_Extrema(object):
+    '''
+    Rolling max (or min) with a monotonic queue , like backtest_engine.rolling_extrema for one window
+    partial : if True the first bars use the part of the window that exists , otherwise they are NaN
+    '''
+    def __repr__(self):
+        return "Rolling Extrema (window={} , how={} , value={})".format(self.window, self.how, self.value)
+
+    def __init__(self, window, how="max", partial=False):
+        self.window = int(window)
+        self.how = how
+        self.partial = partial
+        self.queue = deque() # (bar , value) with values in decreasing (max) or increasing (min) order
+        self.bar = -1
+        self.value = math.nan
+
+    def update(self, x):
+        x = float(x)
+        self.bar += 1
+        if self.how == "max" :
+            while self.queue and self.queue[-1][1] <= x :
+                self.queue.pop()
+        else :
+            while self.queue and self.queue[-1][1] >= x :
+                self.queue.pop()
+        self.queue.append((self.bar, x))
+        if self.queue[0][0] <= self.bar - self.window :
+            self.queue.popleft()
+        self.value = self.queue[0][1] if self.partial or self.bar >= self.window - 1 else math.nan
+        return self.value
+
+class Ewm_Mean(object):
+    '''
+    Series.ewm(span or alpha , adjust , min_periods).mean() one value at a time (same recursion as pandas , ignore_na=False)
+    '''
+    def __repr__(self):
+        return "EWM Mean (alpha={} , adjust={} , value={})".format(self.alpha, self.adjust, self.value)
+
+    def __init__(self, span=None, alpha=None, adjust=True, min_periods=0):
+        com = (span - 1) / 2.0 if span is not None else (1 - alpha) / alpha
+        self.alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - self.alpha
+        self.new_wt = 1. if adjust else self.alpha
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        self.weighted = None
+        self.old_wt = 1.
+        self.nobs = 0
+        self.value = math.nan
+
+    def update(self, x):
+        cur = float(x)
+        if math.isinf(cur) :
+            cur = math.nan
+        observed = cur == cur
+        self.nobs += observed
+        if self.weighted is None : # first value
+            self.weighted = cur
+        elif self.weighted == self.weighted :
+            self.old_wt *= self.old_wt_factor
+            if observed :
+                if self.weighted != cur :
+                    self.weighted = self.old_wt * self.weighted + self.new_wt * cur
+                    self.weighted /= (self.old_wt + self.new_wt)
+                self.old_wt = self.old_wt + self.new_wt if self.adjust else 1.
+        elif observed :
+            self.weighted = cur
+        self.value = self.weighted if self.nobs >= self.min_periods else math.nan
+        return self.value
+
+#******************************************************* Indicators **************************************************
+class Online_SMA(object):
+    '''
+    Simple moving average of Close (forex_backtest_class.sma)
+    '''
+    def __init__(self, window):
+        self.mean = Rolling_Mean(window)
+        self.value = math.nan
+
+    def update(self, bar):
+        self.value = self.mean.update(bar["Close"])
+        return self.value
+
+class Online_EMA(object):
+    '''
+    Exponential moving average of Close like backtest_engine.ema_bank (NaN before "span" bars if min_periods)
+    '''
+    def __init__(self, span, adjust=True, min_periods=True):
+        self.ewm = Ewm_Mean(span=span, adjust=adjust, min_periods=int(span) if min_periods else 0)
+        self.value = math.nan
+
+    def update(self, bar):
+        self.value = self.ewm.update(bar["Close"])
+        return self.value
+
+class Online_DEMA(object):
+    '''
+    Double exponential moving average of forex_backtest_class.dema : 2 * EMA - EWM(EMA , smooth)
+    span : period of EMA , smooth : period of the second smoothing (short period of the strategy)
+    dema starts on the second bar of the data (the first bar has no return) , so feed bars from there.
+    '''
+    def __init__(self, span, smooth=None):
+        self.ema = Ewm_Mean(span=span, adjust=False)
+        self.smooth = Ewm_Mean(span=span if smooth is None else smooth, adjust=False)
+        self.value = math.nan
+
+    def update(self, bar):
+        ema = self.ema.update(bar["Close"])
+        self.value = 2*ema - self.smooth.update(ema)
+        return self.value
+
+class Online_RSI(object):
+    '''
+    RSI of backtest_engine.rsi_bank : rolling mean of up moves / (up + down moves) * 100 , the first bar is a zero move
+    '''
+    def __init__(self, period=14):
+        self.up = Rolling_Mean(period)
+        self.down = Rolling_Mean(period)
+        self.close = None
+        self.value = math.nan
+
+    def update(self, bar):
+        close = float(bar["Close"])
+        diff = math.nan if self.close is None else close - self.close
+        self.close = close
+        ma_up = self.up.update(diff if diff > 0 else 0.0)
+        ma_down = self.down.update(-diff if diff < 0 else 0.0)
+        self.value = _div(ma_up, ma_up + ma_down) * 100
+        return self.value
+
+class Online_MACD(object):
+    '''
+    MACD (EMA_S - EMA_L) and its signal line (EWM of MACD with min_periods=Signal) of forex_backtest_class.macd
+    value : (macd , signal)
+    '''
+    def __init__(self, short=12, long=26, signal=9):
+        self.short = Online_EMA(short)
+        self.long = Online_EMA(long)
+        self.signal = Ewm_Mean(span=signal, min_periods=signal)
+        self.value = (math.nan, math.nan)
+
+    def update(self, bar):
+        macd = self.short.update(bar) - self.long.update(bar)
+        self.value = (macd, self.signal.update(macd))
+        return self.value
+
+class Online_Bollinger(object):
+    '''
+    Bollinger bands of forex_backtest_class.bollinger
+    value : (sma , lower , upper)
+    '''
+    def __init__(self, window=20, dev=2):
+        self.mean = Rolling_Mean(window)
+        self.std = Rolling_Std(window)
+        self.dev = dev
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, bar):
+        mean = self.mean.update(bar["Close"])
+        std = self.std.update(bar["Close"])
+        self.value = (mean, mean - self.dev * std, mean + self.dev * std)
+        return self.value
+
+class Online_Stochastic(object):
+    '''
+    Stochastic oscilator of forex_backtest_class.stochastic
+    value : (K , D)
+    '''
+    def __init__(self, k=14, d=3):
+        self.low = Rolling_Extrema(k, "min")
+        self.high = Rolling_Extrema(k, "max")
+        self.d = Rolling_Mean(d)
+        self.value = (math.nan, math.nan)
+
+    def update(self, bar):
+        low = self.low.update(bar["Low"])
+        high = self.high.update(bar["High"])
+        k = _div(float(bar["Close"]) - low, high - low) * 100
+        self.value = (k, self.d.update(k))
+        return self.value
+
+class Online_ATR(object):
+    '''
+    Average true range (rolling mean of true range) of backtest_engine.atr_bank
+    '''
+    def __init__(self, period=14):
+        self.mean = Rolling_Mean(period)
+        self.close = None
+        self.tr = math.nan
+        self.value = math.nan
+
+    def update(self, bar):
+        high, low = float(bar["High"]), float(bar["Low"])
+        if self.close is None :
+            self.tr = math.nan
+        else :
+            self.tr = max(abs(high - low), abs(high - self.close), abs(low - self.close))
+        self.close = float(bar["Close"])
+        self.value = self.mean.update(self.tr)
+        return self.value
+
+class Online_ADX(object):
+    '''
+    +DI , -DI and ADX (Wilder) of backtest_engine.adx_bank
+    The sums of the first "period" bars and the mean of the first "period" DX values are kept once for the seeds ,
+    later bars only update the three Wilder averages.
+    value : (plus_di , minus_di , adx)
+    '''
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.alpha = 1 / self.period
+        self.bar = -1
+        self.prev = None
+        self.warm = [] # (tr , dm_plus , dm_minus) of bars 1 ... period
+        self.dx = [] # DX of bars period ... 2 * period - 1
+        self.smooth = None
+        self.adx = Ewm_Mean(alpha=self.alpha, adjust=False)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, bar):
+        high, low, close = float(bar["High"]), float(bar["Low"]), float(bar["Close"])
+        self.bar += 1
+        if self.prev is None :
+            self.prev = (high, low, close)
+            return self.value
+        prev_high, prev_low, prev_close = self.prev
+        self.prev = (high, low, close)
+        tr = max(abs(high - low), abs(high - prev_close), abs(low - prev_close))
+        up_move, down_move = high - prev_high, prev_low - low
+        dm_plus = max(up_move, 0.0) if up_move > down_move else 0.0
+        dm_minus = max(down_move, 0.0) if down_move > up_move else 0.0
+        p = self.period
+        if self.bar < p :
+            self.warm.append((tr, dm_plus, dm_minus))
+            return self.value
+        if self.bar == p :
+            self.warm.append((tr, dm_plus, dm_minus))
+            seeds = np.array(self.warm).sum(axis=0) # same pairwise sum as the batch seed
+            self.smooth = [Ewm_Mean(alpha=self.alpha, adjust=False) for s in seeds]
+            values = [e.update(s * self.alpha) / self.alpha for e, s in zip(self.smooth, seeds)]
+            self.warm = None
+        else :
+            values = [e.update(v) / self.alpha for e, v in zip(self.smooth, (tr, dm_plus, dm_minus))]
+        tr_n, plus, minus = values
+        plus_di = _div(100 * plus, tr_n)
+        minus_di = _div(100 * minus, tr_n)
+        dx = _div(100 * abs(plus_di - minus_di), plus_di + minus_di)
+        adx = math.nan
+        if self.bar < 2 * p :
+            self.dx.append(dx)
+            if self.bar == 2 * p - 1 :
+                adx = self.adx.update(np.array(self.dx).mean())
+                self.dx = None
+        else :
+            adx = self.adx.update(dx)
+        self.value = (plus_di, minus_di, adx)
+        return self.value
+
+class Online_Ichimoku(object):
+    '''
+    Ichimoku lines of forex_backtest_class.ichimoku (ta IchimokuIndicator with visual=False , fillna=True)
+    value : (tenkan , kijun , span_a , span_b)
+    '''
+    def __init__(self, tenkan=9, kijun=26, senkou=52):
+        self.lines = [(Rolling_Extrema(w, "max", partial=True), Rolling_Extrema(w, "min", partial=True)) for w in (tenkan, kijun, senkou)]
+        self.value = (math.nan, math.nan, math.nan, math.nan)
+
+    def update(self, bar):
+        high, low = bar["High"], bar["Low"]
+        tenkan, kijun, span_b = [0.5 * (h.update(high) + l.update(low)) for h, l in self.lines]
+        self.value = (tenkan, kijun, 0.5 * (tenkan + kijun), span_b)
+        return self.value
+
+class Online_OBV(object):
+    '''
+    On balance volume of forex_backtest_class.obv : cumulative sum of Volume with the sign of the return , 0 for the first bar
+    '''
+    def __init__(self):
+        self.close = None
+        self.value = 0.0
+
+    def update(self, bar):
+        close = float(bar["Close"])
+        if self.close is None :
+            direction = 0
+        else :
+            direction = 1 if math.log(close / self.close) > 0 else -1
+        self.close = close
+        self.value += float(bar["Volume"]) * direction
+        return self.value
+
+#******************************************************* Many Symbols ************************************************
+class Live_Indicators(object):
+    '''
+    Online indicators of many symbols , every symbol keeps its own set built by factory
+    factory : function() -> dict of name -> online indicator , for example
+              lambda : {"sma_s": Online_SMA(10) , "sma_l": Online_SMA(50) , "adx": Online_ADX(14)}
+    '''
+    def __repr__(self):
+        return "Live Indicators (symbols={})".format(len(self.symbols))
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.symbols = {}
+        self.last_bar = {}
+
+    def update(self, symbol, bar, time=None):
+        '''
+        Update indicators of symbol with a closed bar and return dict of name -> value
+        time : time of the bar , a bar with the same time as the last one is not counted again
+        '''
+        if symbol not in self.symbols :
+            self.symbols[symbol] = self.factory()
+        if time is not None :
+            if self.last_bar.get(symbol) == time :
+                return self.values(symbol)
+            self.last_bar[symbol] = time
+        return {name: ind.update(bar) for name, ind in self.symbols[symbol].items()}
+
+    def warm_up(self, symbol, frame):
+        '''
+        Feed the history of symbol (DataFrame with Open , High , Low , Close , Volume) once before the live bars
+        '''
+        for time, bar in zip(frame.index, frame.to_dict("records")) :
+            self.update(symbol, bar, time)
+        return self.values(symbol)
+
+    def values(self, symbol):
+        return {name: ind.value for name, ind in self.symbols[symbol].items()}
@@ -0,0 +1,118 @@
+'''
+Parallel walk forward studies : independent (ticker , windows , strategy) jobs of forex_backtest_class run in a process pool.
+Every worker process builds the class once in its initializer , jobs only carry their small arguments.
+With share=True the data is loaded once by the parent and workers attach to it in shared memory (no copy , no reading of files).
+'''
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import myforexclass as mf
+import profiling as pf
+
+_worker = None # forex_backtest_class of this worker process
+
+def _init_worker(args, kwargs):
+    global _worker
+    _worker = mf.forex_backtest_class(*args, **kwargs)
+
+def _run_job(number, ticker, strategy, windows):
+    start = time.perf_counter()
+    rows = _worker.walk_forward_rows(ticker, windows, strategy)
+    profile = None
+    if _worker.profiler.enabled : # stages of this job only , the parent adds them up
+        profile = _worker.profiler.to_dict()
+        _worker.profiler.reset()
+    return number, rows, time.perf_counter() - start, os.getpid(), profile
+
+def split_windows(windows, chunk=None):
+    '''
+    Windows in chunks of "chunk" windows (one chunk if chunk is None) , more chunks give more parallel jobs
+    '''
+    if not chunk :
+        return [windows] if windows else []
+    return [windows[i:i + chunk] for i in range(0, len(windows), chunk)]
+
+class Parallel_Study(object):
+    '''
+    Walk forward of many tickers and strategies in a pool of worker processes
+    args , kwargs : arguments of forex_backtest_class , every worker builds one instance with them
+    workers       : number of processes (default os.cpu_count())
+    share         : publish OHLCV arrays of the parent in shared memory , workers attach to them instead of loading the data
+    With kwargs {"profile": True} the profiles of all jobs are added up in self.profiler (profiling.Stage_Profiler).
+    '''
+    def __repr__(self):
+        return "Parallel Study (tickers={} , workers={})".format(self.args[0], self.workers)
+
+    def __init__(self, args, kwargs=None, workers=None, share=True):
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.share = share
+        self.local = None
+        self.profiler = pf.Stage_Profiler(self.kwargs.get("profile", False))
+
+    def jobs(self, in_sample, out_sample, step=None, strategies=None, chunk=None, store=None):
+        '''
+        List of jobs (number , ticker , strategy , windows , window numbers) in a fixed order : ticker , strategy , window chunk.
+        Windows whose (ticker , window , strategy) key is in store (result_store.Result_Store) are left out.
+        '''
+        if self.local is None :
+            self.local = mf.forex_backtest_class(*self.args, **self.kwargs) # only for dates of windows
+            self.profiler.merge(self.local.profiler)
+        strategies = self.local.strategies if strategies is None else strategies
+        jobs = []
+        for ticker in self.local.tickers :
+            index = self.local.ohlcv[ticker].index
+            windows = list(enumerate(self.local.walk_windows(ticker, in_sample, out_sample, step)))
+            for strategy in strategies :
+                todo = windows
+                if store is not None :
+                    done = store.done_keys(ticker, strategy)
+                    todo = [(w, (lo, mid, hi)) for w, (lo, mid, hi) in windows
+                            if (ticker, store.window_key(index[lo], index[mid], index[hi-1]), strategy) not in done]
+                for part in split_windows(todo, chunk) :
+                    jobs.append((len(jobs), ticker, strategy, [win for w, win in part], [w for w, win in part]))
+        return jobs
+
+    def run(self, in_sample, out_sample, step=None, strategies=None, chunk=None, store=None):
+        '''
+        Run all jobs in the pool. Results are returned in job order whatever order the workers finish in ,
+        rows are saved in store (if given) as soon as a job is done.
+        chunk : windows per job (default all windows of a (ticker , strategy) in one job) , every job scores the grid on the
+                whole series , so use it only when there are fewer (ticker , strategy) jobs than workers
+        Returns (table , timing)
+            table  : tidy DataFrame of walk forward rows (like forex_backtest_class.walk_forward)
+            timing : DataFrame of jobs with ticker , strategy , windows , elapsed (seconds) and pid of the worker
+        '''
+        jobs = self.jobs(in_sample, out_sample, step, strategies, chunk, store)
+        results = [None] * len(jobs)
+        if jobs :
+            kwargs , blocks = self.kwargs , []
+            if self.share :
+                descriptors , blocks = self.local.share_data()
+                kwargs = dict(self.kwargs, shared=descriptors)
+            try :
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)), initializer=_init_worker,
+                                         initargs=(self.args, kwargs)) as pool :
+                    futures = [pool.submit(_run_job, number, ticker, strategy, windows) for number, ticker, strategy, windows, numbers in jobs]
+                    for future in as_completed(futures) :
+                        number, rows, elapsed, pid, profile = future.result()
+                        if profile is not None :
+                            self.profiler.merge(profile)
+                        for row, w in zip(rows, jobs[number][4]) :
+                            row["window"] = w
+                        results[number] = (rows, elapsed, pid)
+                        if store is not None :
+                            store.add([dict(row, window=store.window_key(row["is_start"], row["oos_start"], row["oos_end"]),
+                                            elapsed=elapsed / len(rows)) for row in rows])
+            finally :
+                for block in blocks : # workers are finished , free the shared memory
+                    block.close()
+                    block.unlink()
+        table = [row for rows, elapsed, pid in results for row in rows]
+        timing = pd.DataFrame([(number, ticker, strategy, len(windows), results[number][1], results[number][2])
+                               for number, ticker, strategy, windows, numbers in jobs],
+                              columns=["job", "ticker", "strategy", "windows", "elapsed", "pid"])
+        columns = ["ticker", "window", "is_start", "is_end", "oos_start", "oos_end", "strategy", "params", "is_perf", "oos_perf", "oos_hold"]
+        return pd.DataFrame(table, columns=columns), timing
@@ -0,0 +1,183 @@
+'''
+Parameter search that scores a part of the grid of best_param_* : a strided coarse grid is refined around its best points ,
+optionally with successive halving (candidates are scored on a prefix of the bars and only the survivors on the whole series).
+The search only needs a scoring function , score(space , rows) -> array of the shape of the product of space
+(rows : number of first bars to score on , None for all) , like forex_backtest_class.grid_scores.
+The same space , data , options and seed always give the same result , so wide ranges can be searched reproducibly.
+'''
+import math
+import numpy as np
+
+def new_seed():
+    '''
+    Random seed for a search that was not given one (kept in the search info to repeat it)
+    '''
+    return int(np.random.SeedSequence().entropy % 2**32)
+
+def coarse_space(space, stride, seed):
+    '''
+    Every stride-th value of each range , from an offset drawn with seed (so the grid is not always pinned to the first value).
+    Every value of a range is less than stride steps away from a coarse value.
+    '''
+    rng = np.random.default_rng(seed)
+    coarse = []
+    for r in space :
+        offset = int(rng.integers(min(stride, len(r)))) if len(r) else 0
+        coarse.append(r[offset::stride])
+    return tuple(coarse)
+
+def neighbours(space, point, radius):
+    '''
+    Sub space of the values of every range at most radius steps away from point (a region to refine)
+    '''
+    region = []
+    for r, value in zip(space, point) :
+        i = r.index(value)
+        region.append(r[max(0, i - radius):i + radius + 1])
+    return tuple(region)
+
+def points_of(space):
+    '''
+    All points (tuples) of the product of space , in the order of itertools.product
+    '''
+    if not all(len(r) for r in space) :
+        return []
+    grids = np.meshgrid(*[np.asarray(r) for r in space], indexing="ij")
+    return [tuple(int(v) for v in p) for p in np.stack([g.ravel() for g in grids], axis=1)]
+
+def point_grids(points):
+    '''
+    Small product spaces that together hold exactly the given points : points equal in all values but one (the dimension
+    that gives the fewest spaces) are one space with a list of values in that dimension.
+    Returns list of (space , points in the order of its product).
+    '''
+    points = sorted(set(points))
+    if not points :
+        return []
+    best = None
+    for d in range(len(points[0])) :
+        groups = {}
+        for p in points :
+            groups.setdefault(p[:d] + p[d+1:], []).append(p[d])
+        if best is None or len(groups) < len(best[1]) :
+            best = (d, groups)
+    d, groups = best
+    grids = []
+    for rest, values in groups.items() :
+        space = [[v] for v in rest]
+        space.insert(d, values)
+        grids.append((tuple(space), [rest[:d] + (v,) + rest[d:] for v in values]))
+    return grids
+
+def score_points(score, points, rows=None):
+    '''
+    Scores of points (dict point -> score) , rounded like best_param_* , NaN is -inf
+    '''
+    scores = {}
+    for space, group in point_grids(points) :
+        values = np.round(np.nan_to_num(np.asarray(score(space, rows), dtype=np.float64).ravel(), nan=-np.inf), 5)
+        scores.update(zip(group, values))
+    return scores
+
+def ranked(scores):
+    '''
+    Points from the best score down , ties in the order of itertools.product (the first point wins like np.argmax)
+    '''
+    points = sorted(scores)
+    values = np.array([scores[p] for p in points])
+    return [points[i] for i in np.argsort(-values, kind="stable")]
+
+class Search_Cost(object):
+    '''
+    Work of a search : points scored , points scored on all bars and point x bars (the unit of cost of a grid)
+    '''
+    def __repr__(self):
+        return "Search Cost (points={} , full={} , point_bars={})".format(self.points, self.full, self.point_bars)
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.points = 0
+        self.full = 0
+        self.point_bars = 0
+
+    def add(self, count, rows=None):
+        rows = self.bars if rows is None else rows
+        self.points += count
+        self.full += count if rows >= self.bars else 0
+        self.point_bars += count * rows
+
+def halving_rows(candidates, keep, bars, eta, min_rows):
+    '''
+    Prefix lengths of the rungs of successive halving : every rung keeps 1/eta of the candidates and scores them on eta
+    times more bars , the last prefix is shorter than bars (the survivors are then scored on all bars).
+    '''
+    if candidates <= keep or eta < 2 :
+        return []
+    rungs = math.ceil(math.log(candidates / keep) / math.log(eta))
+    rows = []
+    for r in range(rungs, 0, -1) :
+        n = max(bars // eta**r, min_rows)
+        if n < bars and (not rows or n > rows[-1]) :
+            rows.append(n)
+    return rows
+
+def successive_halving(score, points, keep, bars, eta=3, min_rows=1, cost=None):
+    '''
+    Score points on growing prefixes of the bars and drop all but the best 1/eta after every rung ,
+    the "keep" survivors (at least) are scored on all bars.
+    Returns dict survivor -> score on all bars
+    '''
+    points = sorted(set(points))
+    for rows in halving_rows(len(points), keep, bars, eta, min_rows) :
+        scores = score_points(score, points, rows)
+        if cost is not None :
+            cost.add(len(points), rows)
+        points = ranked(scores)[:max(keep, math.ceil(len(points) / eta))]
+    if cost is not None :
+        cost.add(len(points))
+    return score_points(score, points)
+
+def coarse_to_fine(score, space, bars, stride=4, top_k=3, halving=False, eta=3, min_rows=None, seed=None):
+    '''
+    Best point of space without scoring the whole grid
+    score    : function(space , rows) -> scores of the product of space on the first rows bars (all bars if rows is None)
+    space    : tuple of ranges (see forex_backtest_class.param_space)
+    bars     : number of bars of the data
+    stride   : step of the coarse grid in every range , the region refined around a point is stride-1 steps wide on each side
+    top_k    : number of best coarse points whose regions are refined
+    halving  : score coarse points and region points by successive halving instead of on all bars
+    eta      : candidates kept per halving rung are 1/eta , prefixes grow by eta
+    min_rows : shortest prefix (default 4 times the largest parameter , so the longest indicator has warmed up)
+    seed     : seed of the coarse grid offsets (a new one is drawn if None)
+    Returns dict with params (None if space is empty) , score , seed , options and cost (Search_Cost)
+    '''
+    seed = new_seed() if seed is None else int(seed)
+    stride = max(1, int(stride))
+    cost = Search_Cost(bars)
+    info = {"params": None, "score": -np.inf, "seed": seed, "stride": stride, "top_k": top_k,
+            "halving": halving, "eta": eta, "grid": int(np.prod([len(r) for r in space])), "cost": cost}
+    if not info["grid"] :
+        return info
+    if min_rows is None :
+        min_rows = 4 * max(max(r) for r in space)
+    min_rows = min(max(int(min_rows), 1), bars)
+    coarse = coarse_space(space, stride, seed)
+    if halving :
+        scores = successive_halving(score, points_of(coarse), top_k, bars, eta, min_rows, cost)
+    else :
+        points = points_of(coarse)
+        values = np.round(np.nan_to_num(np.asarray(score(coarse, None), dtype=np.float64).ravel(), nan=-np.inf), 5)
+        scores = dict(zip(points, values))
+        cost.add(len(points))
+    region = set()
+    for point in ranked(scores)[:top_k] :
+        region.update(points_of(neighbours(space, point, stride - 1)))
+    region -= set(scores) # points already scored on all bars
+    if halving :
+        scores.update(successive_halving(score, region, top_k, bars, eta, min_rows, cost))
+    elif region :
+        scores.update(score_points(score, region))
+        cost.add(len(region))
+    best = ranked(scores)[0]
+    info["params"], info["score"] = best, float(scores[best])
+    return info
@@ -0,0 +1,194 @@
+'''
+Opt-in profiling of forex_backtest_class : named timers and counters around the stages of a study
+(loading data , indicators , grids , the bar loop , printing , ...).
+A Stage_Profiler is switched on or off when it is built. When it is off every hook returns at once
+(one attribute test) , so the hooks stay in the code of nightly studies.
+Methods of the class are wrapped with profiled() , code under them (strategy_api , backtest_engine) reports to the
+profiler of the running method through stage() and count() without taking it as an argument.
+'''
+import functools
+import json
+import sys
+import threading
+import time
+import pandas as pd
+
+class _Null_Stage(object):
+    '''
+    Context manager of a switched off profiler (does nothing)
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _Null_Stage()
+
+class _Stage(object):
+    '''
+    Timer of one run of a named stage
+    '''
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.begin
+        self.profiler.add(self.name, seconds, sys.getallocatedblocks() - self.blocks)
+        return False
+
+class Stage_Profiler(object):
+    '''
+    Calls , cumulative time and net allocated Python blocks of named stages , and named counters
+    enabled : if False all hooks are no-ops
+    Stages may be nested , the time of a stage includes the time of the stages inside it.
+    '''
+    def __repr__(self):
+        return "Stage Profiler (enabled={} , stages={} , counters={})".format(self.enabled, len(self.stages), len(self.counters))
+
+    def __init__(self, enabled=False):
+        self.enabled = bool(enabled)
+        self.lock = threading.Lock()
+        self.stages = {} # name -> [calls , seconds , blocks]
+        self.counters = {}
+
+    def stage(self, name):
+        '''
+        Context manager that times one run of the stage
+        '''
+        if not self.enabled :
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, seconds, blocks=0):
+        with self.lock :
+            row = self.stages.setdefault(name, [0, 0.0, 0])
+            row[0] += 1
+            row[1] += seconds
+            row[2] += blocks
+
+    def count(self, name, n=1):
+        '''
+        Add n to a named counter (bars , grid cells , trades , ...)
+        '''
+        if not self.enabled :
+            return
+        with self.lock :
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock :
+            self.stages.clear()
+            self.counters.clear()
+
+    def merge(self, other):
+        '''
+        Add the stages and counters of another profiler or of its to_dict() (for example from a worker process)
+        '''
+        data = other.to_dict() if isinstance(other, Stage_Profiler) else other
+        with self.lock :
+            for name, row in data["stages"].items() :
+                mine = self.stages.setdefault(name, [0, 0.0, 0])
+                mine[0] += row["calls"]
+                mine[1] += row["seconds"]
+                mine[2] += row["blocks"]
+            for name, n in data["counters"].items() :
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        with self.lock :
+            stages = {name : {"calls": calls, "seconds": seconds, "blocks": blocks} for name, (calls, seconds, blocks) in self.stages.items()}
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def to_json(self, path=None):
+        '''
+        Stages and counters as json text , also written to path if it is given
+        '''
+        text = json.dumps(self.to_dict(), indent=1)
+        if path :
+            with open(path, "w") as f :
+                f.write(text)
+        return text
+
+    def table(self):
+        '''
+        DataFrame of stages sorted by cumulative time : calls , seconds , ms per call , net allocated blocks
+        '''
+        stages = self.to_dict()["stages"]
+        df = pd.DataFrame.from_dict(stages, orient="index", columns=["calls", "seconds", "blocks"])
+        df.index.name = "stage"
+        df["ms_per_call"] = df.seconds / df.calls * 1000
+        return df[["calls", "seconds", "ms_per_call", "blocks"]].sort_values("seconds", ascending=False)
+
+    def activate(self):
+        '''
+        Context manager that makes this profiler the target of stage() and count() in the current thread
+        '''
+        return _Activation(self)
+
+#******************************************************* Hooks ********************************************************
+_DISABLED = Stage_Profiler(False)
+_local = threading.local()
+
+class _Activation(object):
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __enter__(self):
+        self.previous = getattr(_local, "profiler", _DISABLED)
+        _local.profiler = self.profiler
+        return self.profiler
+
+    def __exit__(self, *exc):
+        _local.profiler = self.previous
+        return False
+
+def active():
+    '''
+    Profiler of the running profiled method of this thread (a disabled one if there is none)
+    '''
+    return getattr(_local, "profiler", _DISABLED)
+
+def stage(name):
+    return active().stage(name)
+
+def count(name, n=1):
+    active().count(name, n)
+
+def timed(name):
+    '''
+    Decorator of a function : time its calls as stage name of the active profiler
+    '''
+    def wrap(func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            profiler = getattr(_local, "profiler", _DISABLED)
+            if not profiler.enabled :
+                return func(*args, **kwargs)
+            with profiler.stage(name) :
+                return func(*args, **kwargs)
+        return run
+    return wrap
+
+def profiled(name=None):
+    '''
+    Decorator of a method of an object with a "profiler" attribute : time its calls as stage name (the method name
+    by default) and make the profiler active for the code it calls
+    '''
+    def wrap(method):
+        label = name or method.__name__
+        @functools.wraps(method)
+        def run(self, *args, **kwargs):
+            profiler = self.profiler
+            if not profiler.enabled :
+                return method(self, *args, **kwargs)
+            with profiler.activate(), profiler.stage(label) :
+                return method(self, *args, **kwargs)
+        return run
+    return wrap
@@ -0,0 +1,78 @@
+'''
+Persistent store of batch study results (walk forward rows of forex_backtest_class) in a SQLite table.
+Every row is written when it is ready , so a stopped study loses nothing and a rerun skips the finished keys.
+'''
+import json
+import sqlite3
+import pandas as pd
+
+class Result_Store(object):
+    '''
+    SQLite table "results" keyed by (ticker , window , strategy)
+    path : file of the database
+    window key is "in sample start|out of sample start|out of sample end" , so it does not depend on the numbering of windows
+    '''
+    COLUMNS = ("ticker", "window", "strategy", "params", "is_start", "is_end", "oos_start", "oos_end",
+               "is_perf", "oos_perf", "oos_hold", "elapsed")
+
+    def __repr__(self):
+        return "Result Store (path={})".format(self.path)
+
+    def __init__(self, path="results.db"):
+        self.path = path
+        self.conn_db = sqlite3.connect(path)
+        self.conn_db.execute("PRAGMA journal_mode=WAL")
+        self.conn_db.execute('''CREATE TABLE IF NOT EXISTS results (
+            ticker TEXT NOT NULL , window TEXT NOT NULL , strategy TEXT NOT NULL , params TEXT ,
+            is_start TEXT , is_end TEXT , oos_start TEXT , oos_end TEXT ,
+            is_perf REAL , oos_perf REAL , oos_hold REAL , elapsed REAL ,
+            created TEXT DEFAULT CURRENT_TIMESTAMP ,
+            PRIMARY KEY (ticker , window , strategy))''')
+        self.conn_db.execute("CREATE INDEX IF NOT EXISTS results_strategy ON results (strategy , oos_start)")
+        self.conn_db.commit()
+
+    @staticmethod
+    def window_key(is_start, oos_start, oos_end):
+        return "{}|{}|{}".format(is_start, oos_start, oos_end)
+
+    def done_keys(self, ticker=None, strategy=None):
+        '''
+        Set of finished (ticker , window , strategy) keys
+        '''
+        query = "SELECT ticker , window , strategy FROM results WHERE (? IS NULL OR ticker = ?) AND (? IS NULL OR strategy = ?)"
+        return set(self.conn_db.execute(query, (ticker, ticker, strategy, strategy)).fetchall())
+
+    def add(self, rows):
+        '''
+        Write rows (dicts with COLUMNS) in one transaction , a row with a finished key replaces the old one
+        '''
+        values = [(r["ticker"], r["window"], r["strategy"], json.dumps(None if r["params"] is None else [int(p) for p in r["params"]]),
+                   str(r["is_start"]), str(r["is_end"]), str(r["oos_start"]), str(r["oos_end"]),
+                   r["is_perf"], r["oos_perf"], r["oos_hold"], r.get("elapsed")) for r in rows]
+        query = '''INSERT OR REPLACE INTO results
+        (ticker , window , strategy , params , is_start , is_end , oos_start , oos_end , is_perf , oos_perf , oos_hold , elapsed)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)'''
+        try:
+            self.conn_db.executemany(query, values)
+        except sqlite3.Error as e:
+            print("Error in saving results of study !", e)
+            self.conn_db.rollback()
+            raise
+        else:
+            self.conn_db.commit()
+
+    def query(self, ticker=None, strategy=None, start=None, end=None):
+        '''
+        Results as DataFrame , filtered in SQL by ticker , strategy and out of sample start (start <= oos_start < end)
+        '''
+        query = '''SELECT ticker , window , strategy , params , is_start , is_end , oos_start , oos_end , is_perf , oos_perf , oos_hold , elapsed
+        FROM results WHERE (? IS NULL OR ticker = ?) AND (? IS NULL OR strategy = ?)
+        AND (? IS NULL OR oos_start >= ?) AND (? IS NULL OR oos_start < ?) ORDER BY ticker , oos_start , strategy'''
+        start = None if start is None else str(pd.Timestamp(start))
+        end = None if end is None else str(pd.Timestamp(end))
+        df = pd.read_sql_query(query, self.conn_db, params=(ticker, ticker, strategy, strategy, start, start, end, end))
+        df["params"] = [None if p is None or p == "null" else tuple(json.loads(p)) for p in df["params"]]
+        return df
+
+    def close(self):
+        self.conn_db.close()
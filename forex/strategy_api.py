@@ -0,0 +1,272 @@
+'''
+Stateless strategies and backtests of forex_backtest_class.
+Every function takes (Ticker_Data , parameters , costs) and returns a new result (namedtuple) ,
+nothing is written to shared state , so many strategies and parameter sets can run together in threads
+(the NumPy kernels release the GIL). The only shared object is the optional Indicator_Cache , which is locked.
+The frame and ledger of a result are built by its own call and are not shared with any other result
+(they are mutable objects , forex_backtest_class keeps copies of them , pos is read-only).
+'''
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import backtest_engine as be
+import profiling as pf
+
+Strategy_Result = namedtuple("Strategy_Result", ["strategy", "ticker", "params", "perf", "trades", "frame"])
+Strategy_Result.__doc__ = '''
+Vectorized result of a strategy
+perf   : cum_str_net of the last bar (rounded to 5 digits)
+trades : sum of position changes
+frame  : indicators , position , trades and cum_str_net of each bar
+'''
+
+Backtest_Result = namedtuple("Backtest_Result", ["strategy", "ticker", "params", "perf", "trades", "hold", "balance",
+                                                 "units", "months", "cagr", "date", "price", "amount", "spread", "frame", "pos", "ledger"])
+Backtest_Result.__doc__ = '''
+Result of trading a strategy with all the capital and closing the position in the last bar
+perf    : performance (%) of the capital , hold : performance (%) of buy and hold
+balance : balance after closing , units : units closed in the last bar
+months  : number of months of the bars , cagr : compound growth rate of the months
+date , price : date and close price of the last bar
+frame   : indicators of each bar , pos : bookkeeping position after each bar
+ledger  : backtest_engine.Trade_Ledger of every fill (the last one closes the position)
+'''
+
+def strategy_result(strategy, ticker, params, df, spread, column="pos"):
+    '''
+    pos -> trades -> cum_str_net of df with backtest_engine.pnl_kernel , the first bar (without strategy return) is dropped
+    '''
+    pos = df[column].to_numpy()
+    pf.count("bars", len(pos))
+    with pf.stage("pnl") :
+        perf, trades, equity = be.pnl_kernel(pos, df["returns"].to_numpy(), spread, curves=True)
+    df["trades"] = np.abs(np.diff(pos, prepend=pos[:1]))
+    df["cum_str_net"] = equity[:, 0]
+    df.dropna(inplace=True)
+    return Strategy_Result(strategy, ticker, tuple(params), round(perf[0], 5), float(trades[0]), df)
+
+def backtest_result(strategy, ticker, params, df, pos, spread, amount):
+    '''
+    Trade pos with backtest_engine.simulate_trades and close all the units in the last bar like close_position
+    '''
+    close = df["Close"].to_numpy()
+    time = df.index.as_unit("ns").asi8
+    ledger = be.Trade_Ledger(spread)
+    pf.count("bars", len(close))
+    with pf.stage("bar_loop") :
+        balance, units, trades = be.simulate_trades(pos, close, spread, amount, ledger, time)
+    price = round(close[-1], 5)
+    balance = balance + units * price - abs(units) * spread/2
+    ledger.close(len(close) - 1, time[-1], units, price, balance)
+    trades += 1
+    months = len(np.unique(df.index.year * 12 + df.index.month))
+    perf = round((balance - amount) / amount * 100, 2)
+    cagr = (balance / amount) ** (1 / months) - 1
+    hold = round((df["cum_return"].iloc[-1] - 1) * 100, 2)
+    pos = np.array(pos)
+    pos.setflags(write=False)
+    date = str(df.index[-1].strftime('%Y-%m-%d %H:%M:%S'))
+    return Backtest_Result(strategy, ticker, tuple(params), perf, trades, hold, balance,
+                           units, months, cagr, date, price, amount, spread, df, pos, ledger)
+
+def adx_allow(df, adx=None, level=25):
+    '''
+    Bars of df where trading is allowed : ADX (Series of dates) over level , all bars if adx is None
+    '''
+    if adx is None :
+        return np.ones(len(df), dtype=bool)
+    return (adx.reindex(df.index).round(2) > level).to_numpy()
+
+#******************************************************* Indicator Frames *********************************************
+@pf.timed("indicators")
+def sma_frame(data, SMA_S, SMA_L, cache=None, key=None):
+    df = data.to_frame()
+    df["SMA_S"], df["SMA_L"] = be.rolling_bank(df.Close.to_numpy(), [SMA_S, SMA_L], "mean", cache, key).T
+    df.dropna(inplace=True)
+    return df
+
+@pf.timed("indicators")
+def ema_frame(data, EMA_S, EMA_L, cache=None, key=None):
+    df = data.to_frame()
+    df["EMA_S"], df["EMA_L"] = be.ema_bank(df.Close.to_numpy(), [EMA_S, EMA_L], cache=cache, key=key).T
+    df.dropna(inplace=True)
+    return df
+
+@pf.timed("indicators")
+def dema_frame(data, short, long, cache=None, key=None):
+    df = data.to_frame()
+    df["returns"] = np.log(df.Close.div(df.Close.shift(1)))
+    df.dropna(inplace=True)
+    EMA = pd.DataFrame(be.ema_bank(df.Close.to_numpy(), [short, long], adjust=False, min_periods=False, cache=cache, key=key, name="ema_from_bar1"), index=df.index)
+    df["DEMA_S"], df["DEMA_L"] = (2*EMA - EMA.ewm(span=short, adjust=False).mean()).to_numpy().T
+    return df
+
+@pf.timed("indicators")
+def rsi_frame(data, period, cache=None, key=None):
+    df = data.to_frame()
+    df["returns"] = np.log(df.Close.div(df.Close.shift(1)))
+    df.dropna(inplace=True)
+    df["RSI"] = be.rsi_bank(df.Close.to_numpy(), [int(period)], cache, key)[:, 0] # Moving average of green candles / (green + red candles)
+    df.dropna(inplace=True)
+    return df
+
+@pf.timed("indicators")
+def macd_frame(data, EMA_S, EMA_L, Signal, cache=None, key=None):
+    df = data.to_frame()
+    df["EMA_S"], df["EMA_L"] = be.ema_bank(df.Close.to_numpy(), [EMA_S, EMA_L], cache=cache, key=key).T
+    df["MACD"] = df["EMA_S"] - df["EMA_L"]
+    df["MACD_Signal"] = df.MACD.ewm(span=Signal, min_periods=Signal).mean()
+    df.dropna(inplace=True)
+    return df
+
+@pf.timed("indicators")
+def bollinger_bands(data, sma, dev, cache=None, key=None):
+    '''
+    Simple moving average of Close and the bands dev standard deviations under and over it (arrays of all bars)
+    '''
+    close = data.close
+    mean = be.rolling_bank(close, [sma], "mean", cache, key)[:, 0]
+    std = be.rolling_bank(close, [sma], "std", cache, key)[:, 0]
+    return mean, mean - dev * std, mean + dev * std
+
+@pf.timed("indicators")
+def stochastic_frame(data, K, D, cache=None, key=None):
+    df = data.to_frame()
+    df["roll_low"] = be.rolling_extrema(df.Low.to_numpy(), [int(K)], "min", cache=cache, key=key, name="low")[:, 0]
+    df["roll_high"] = be.rolling_extrema(df.High.to_numpy(), [int(K)], "max", cache=cache, key=key, name="high")[:, 0]
+    df["K"] = (df.Close - df.roll_low) / (df.roll_high - df.roll_low) * 100
+    df["D"] = df.K.rolling(int(D)).mean()
+    return df
+
+@pf.timed("indicators")
+def ichimoku_frame(data, tenkan=9, kijun=26, senkou=52, cache=None, key=None):
+    df = data.to_frame()
+    lines = be.ichimoku_lines(df.High.to_numpy(), df.Low.to_numpy(), [tenkan, kijun, senkou], cache, key) # same as ta IchimokuIndicator (visual=False , fillna=True)
+    df["tenkensen"], df["kijunsen"], df["span_b"] = lines.T
+    df["span_a"] = 0.5 * (df["tenkensen"] + df["kijunsen"])
+    return df
+
+#******************************************************* Strategies ***************************************************
+def sma(data, SMA_S, SMA_L, spread=0, cache=None, key=None):
+    df = sma_frame(data, SMA_S, SMA_L, cache, key)
+    df["pos"] = np.where(df.SMA_S > df.SMA_L, 1, -1) # position of buy (1) or sell (-1)
+    return strategy_result("sma", data.ticker, (SMA_S, SMA_L), df, spread)
+
+def ema(data, EMA_S, EMA_L, spread=0, cache=None, key=None):
+    df = ema_frame(data, EMA_S, EMA_L, cache, key)
+    df["pos"] = np.where(df.EMA_S > df.EMA_L, 1, -1)
+    return strategy_result("ema", data.ticker, (EMA_S, EMA_L), df, spread)
+
+def dema(data, short, long, spread=0, cache=None, key=None):
+    df = dema_frame(data, short, long, cache, key)
+    df["pos"] = np.where(df['DEMA_S'] > df['DEMA_L'], 1, -1)
+    return strategy_result("dema", data.ticker, (short, long), df, spread)
+
+def rsi(data, period=14, ma_down=30, ma_up=70, spread=0, cache=None, key=None):
+    df = rsi_frame(data, period, cache, key)
+    df["pos"] = np.where(df.RSI > int(ma_up), -1, np.nan) # Sell warning
+    df["pos"] = np.where(df.RSI < int(ma_down), 1, df.pos) # Buy warning
+    df.pos = df.pos.fillna(0)
+    return strategy_result("rsi", data.ticker, (period, ma_down, ma_up), df, spread)
+
+def macd(data, EMA_S, EMA_L, Signal, spread=0, cache=None, key=None):
+    df = macd_frame(data, EMA_S, EMA_L, Signal, cache, key)
+    df["pos"] = np.where(df.MACD - df.MACD_Signal > 0, 1, -1)
+    return strategy_result("macd", data.ticker, (EMA_S, EMA_L, Signal), df, spread)
+
+def bollinger(data, sma, dev, spread=0, cache=None, key=None):
+    '''
+    Buy under the lower band , sell over the upper band and go neutral when Close crosses the moving average
+    '''
+    df = data.to_frame()
+    df["sma"], df["lower"], df["upper"] = bollinger_bands(data, sma, dev, cache, key)
+    df.dropna(inplace=True)
+    df["position"] = np.where(df.Close < df.lower, 1, np.nan)
+    df["position"] = np.where(df.Close > df.upper, -1, df["position"])
+    df["distance"] = df.Close - df.sma
+    df["position"] = np.where(df.distance * df.distance.shift(1) < 0, 0, df["position"])
+    df["position"] = df.position.ffill().fillna(0)
+    return strategy_result("bollinger", data.ticker, (sma, dev), df, spread, column="position")
+
+def stochastic(data, K, D, spread=0, cache=None, key=None):
+    df = stochastic_frame(data, K, D, cache, key)
+    df["pos"] = np.where(df["K"] > df["D"], 1, -1)
+    df.dropna(inplace=True)
+    return strategy_result("stochastic", data.ticker, (K, D), df, spread)
+
+def ichimoku(data, tenkan=9, kijun=26, senkou=52, spread=0, cache=None, key=None):
+    df = ichimoku_frame(data, tenkan, kijun, senkou, cache, key)
+    df["pos1"] = np.where(df["tenkensen"] > df["kijunsen"], 1, -1)
+    df["pos2"] = np.where(df["span_a"] > df["span_b"], 1, -1)
+    df["pos"] = (df["pos1"] + df["pos2"]) / 2
+    return strategy_result("ichimoku", data.ticker, (tenkan, kijun, senkou), df, spread)
+
+#******************************************************* Backtests ****************************************************
+# adx : ADX Series of the ticker (e.g. forex_backtest_class.adx_data(ticker)["adx"]) to trade only over level , None for all bars
+def sma_backtest(data, SMA_S, SMA_L, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = sma_frame(data, SMA_S, SMA_L, cache, key)
+    allow = adx_allow(df, adx)
+    pos = be.signal_positions((df.SMA_S > df.SMA_L) & allow, (df.SMA_S < df.SMA_L) & allow)
+    return backtest_result("sma", data.ticker, (SMA_S, SMA_L), df, pos, spread, amount)
+
+def ema_backtest(data, EMA_S, EMA_L, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = ema_frame(data, EMA_S, EMA_L, cache, key)
+    allow = adx_allow(df, adx)
+    pos = be.signal_positions((df.EMA_S > df.EMA_L) & allow, (df.EMA_S < df.EMA_L) & allow)
+    return backtest_result("ema", data.ticker, (EMA_S, EMA_L), df, pos, spread, amount)
+
+def dema_backtest(data, short, long, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = dema_frame(data, short, long, cache, key)
+    df = df.iloc[1:].copy() # Same bars as dema() : the first bar has no strategy return
+    allow = adx_allow(df, adx)
+    pos = be.signal_positions((df.DEMA_S > df.DEMA_L) & allow, (df.DEMA_S < df.DEMA_L) & allow)
+    return backtest_result("dema", data.ticker, (short, long), df, pos, spread, amount)
+
+def rsi_backtest(data, period, ma_down, ma_up, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = rsi_frame(data, period, cache, key)
+    pos = be.signal_positions(df.RSI < int(ma_down), df.RSI > int(ma_up)) # ADX is not used by RSI strategy
+    return backtest_result("rsi", data.ticker, (period, ma_down, ma_up), df, pos, spread, amount)
+
+def macd_backtest(data, EMA_S, EMA_L, Signal, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = macd_frame(data, EMA_S, EMA_L, Signal, cache, key)
+    allow = adx_allow(df, adx)
+    pos = be.signal_positions((df.MACD - df.MACD_Signal > 0) & allow, (df.MACD - df.MACD_Signal < 0) & allow)
+    return backtest_result("macd", data.ticker, (EMA_S, EMA_L, Signal), df, pos, spread, amount)
+
+def bollinger_backtest(data, SMA, dev, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = data.to_frame()
+    df["SMA"], df["Lower"], df["Upper"] = bollinger_bands(data, SMA, dev, cache, key)
+    df.dropna(inplace=True)
+    allow = adx_allow(df, adx)
+    pos = be.bollinger_positions(df.Close.to_numpy(), df[["SMA"]].to_numpy(), df[["Lower"]].to_numpy(), df[["Upper"]].to_numpy(), [0], allow)[:, 0]
+    return backtest_result("bollinger", data.ticker, (SMA, dev), df, pos, spread, amount)
+
+def stochastic_backtest(data, K, D, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = stochastic_frame(data, K, D, cache, key)
+    df.dropna(inplace=True)
+    allow = adx_allow(df, adx)
+    pos = be.signal_positions((df.K > df.D) & allow, (df.K < df.D) & allow)
+    return backtest_result("stochastic", data.ticker, (K, D), df, pos, spread, amount)
+
+def ichimoku_backtest(data, tenkan=9, kijun=26, senkou=52, spread=0, amount=0, adx=None, cache=None, key=None):
+    df = ichimoku_frame(data, tenkan, kijun, senkou, cache, key)
+    df.dropna(inplace=True)
+    pos = be.ichimoku_positions(df.tenkensen.to_numpy(), df.kijunsen.to_numpy(), df.span_a.to_numpy(), df.span_b.to_numpy())
+    return backtest_result("ichimoku", data.ticker, (tenkan, kijun, senkou), df, pos, spread, amount)
+
+STRATEGIES = {"sma": sma, "ema": ema, "dema": dema, "rsi": rsi, "macd": macd,
+              "bollinger": bollinger, "stochastic": stochastic, "ichimoku": ichimoku}
+BACKTESTS = {"sma": sma_backtest, "ema": ema_backtest, "dema": dema_backtest, "rsi": rsi_backtest, "macd": macd_backtest,
+             "bollinger": bollinger_backtest, "stochastic": stochastic_backtest, "ichimoku": ichimoku_backtest}
+
+def run_many(data, jobs, spread=0, cache=None, key=None, workers=4):
+    '''
+    Run many strategies on one Ticker_Data in a thread pool (results in the order of jobs)
+    jobs : list of (strategy name , params)
+    '''
+    def run(job):
+        strategy, params = job
+        return STRATEGIES[strategy](data, *params, spread=spread, cache=cache, key=key)
+    with ThreadPoolExecutor(max_workers=workers) as pool :
+        return list(pool.map(run, jobs))
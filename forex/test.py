@@ -1,31 +1,49 @@
-import MetaTrader5 as mt5
-
-# Initialize MetaTrader 5 connection
-if not mt5.initialize():
-    print("Failed to initialize MetaTrader 5")
-    quit()
-
-# Specify the symbol you want to check
-symbols = mt5.symbols_get()
-# Retrieve symbol information
-for symbol in symbols:
-    symbol_info = mt5.symbol_info(symbol.name)
-
-    if symbol_info is not None:
-        # Get the supported filling modes
-        filling_modes = symbol_info.filling_mode
-
-        # Map filling modes to human-readable names
-        filling_mode_names = {
-            0: "ORDER_FILLING_FOK",
-            1: "ORDER_FILLING_IOC",
-            2: "ORDER_FILLING_RETURN" ,
-            3: "ORDER_FILLING_BOC"
-        }
-    
-        print(f"Supported filling modes for {symbol.name} : {filling_modes}")
-    else:
-        print(f"Symbol {symbol} not found or not available.")
-
-# Shut down MetaTrader 5 connection
-mt5.shutdown()
+import sys
+import benchmark as bm
+
+def test_no_heavy_imports():
+    '''
+    myforexclass must import without the plotting and data source backends (benchmark.HEAVY_MODULES) ,
+    they are loaded on first use. The import runs in a new interpreter , time is not checked.
+    '''
+    seconds , heavy = bm.import_time("myforexclass" , repeat=1)
+    assert not heavy , "import of myforexclass loaded {}".format(", ".join(heavy))
+    print("import of myforexclass loads none of {}".format(", ".join(bm.HEAVY_MODULES)))
+
+def filling_modes():
+    import MetaTrader5 as mt5
+
+    # Initialize MetaTrader 5 connection
+    if not mt5.initialize():
+        print("Failed to initialize MetaTrader 5")
+        quit()
+
+    # Specify the symbol you want to check
+    symbols = mt5.symbols_get()
+    # Retrieve symbol information
+    for symbol in symbols:
+        symbol_info = mt5.symbol_info(symbol.name)
+
+        if symbol_info is not None:
+            # Get the supported filling modes
+            filling_modes = symbol_info.filling_mode
+
+            # Map filling modes to human-readable names
+            filling_mode_names = {
+                0: "ORDER_FILLING_FOK",
+                1: "ORDER_FILLING_IOC",
+                2: "ORDER_FILLING_RETURN" ,
+                3: "ORDER_FILLING_BOC"
+            }
+
+            print(f"Supported filling modes for {symbol.name} : {filling_modes}")
+        else:
+            print(f"Symbol {symbol} not found or not available.")
+
+    # Shut down MetaTrader 5 connection
+    mt5.shutdown()
+
+if __name__ == "__main__":
+    test_no_heavy_imports()
+    if sys.argv[1:] != ["imports"] : # "python test.py imports" runs only the import check
+        filling_modes()